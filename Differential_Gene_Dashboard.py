@@ -1,25 +1,59 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
 
+from gene_index import ANNOTATION_PATH, GeneSearchIndex, load_annotation
+from ingest import UPLOAD_TYPES, preview_rows, sniff_header
+from matrix_store import open_matrix
+from perf import performance_panel, stage, start_run
+
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Dashboard", trace_memory=show_performance)
+
 st.title("🧬 Gene Expression Dashboard")
 
-uploaded_file = st.file_uploader("Upload a CSV file with gene expression data", type="csv")
+@st.cache_resource(show_spinner=False)
+def load_gene_index(store_path, annotation_path, _genes):
+    """Search index over the dataset's genes (and optional annotation), built once per converted matrix."""
+    annotation = load_annotation(annotation_path) if annotation_path else None
+    return GeneSearchIndex(_genes, annotation)
+
+uploaded_file = st.file_uploader("Upload a CSV file with gene expression data", type=UPLOAD_TYPES)
 
 if uploaded_file is not None:
-    df = pd.read_csv(uploaded_file)
-    st.write("Preview of your data:", df.head())
+    st.write("Preview of your data:", preview_rows(uploaded_file))
+
+    # First column is the sample ID; the genes are stored memory-mapped on disk
+    header = sniff_header(uploaded_file)
+    with stage("open_matrix"):
+        store = open_matrix(uploaded_file, header[0])
 
-    gene = st.selectbox("Select a gene", df.columns[1:])  # skip first column if it's 'Sample'
+    gene_index = load_gene_index(store.path, ANNOTATION_PATH, store.genes)
 
-    chart = alt.Chart(df).mark_bar().encode(
-        x='Sample',
-        y=gene,
-        tooltip=['Sample', gene]
-    ).properties(
-        title=f'Expression of {gene} across samples'
-    )
+    # Search the genes server-side; only the top matches are sent to the selectbox
+    query = st.text_input("Search genes (symbol, alias or Ensembl ID)")
+    matches = gene_index.search(query)
+    labels = {gene: gene if key in (None, gene.lower()) else f"{gene} ({key})" for gene, key in matches}
 
-    st.altair_chart(chart, use_container_width=True)
+    if not matches:
+        st.warning(f"No genes match '{query}'.")
+    else:
+        gene = st.selectbox("Select a gene", list(labels), format_func=labels.get)
+        st.caption(f"Showing {len(matches)} of {len(gene_index):,} genes")
+        df = store.gene_frame(gene, value_name=gene)
+
+        chart = alt.Chart(df).mark_bar().encode(
+            x='Sample',
+            y=gene,
+            tooltip=['Sample', gene]
+        ).properties(
+            title=f'Expression of {gene} across samples'
+        )
+
+        with stage("altair_chart"):
+            st.altair_chart(chart, use_container_width=True)
 else:
     st.info("Please upload a file to get started.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
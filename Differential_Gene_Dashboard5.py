@@ -1,10 +1,19 @@
 import streamlit as st
-import pandas as pd
-import altair as alt
+
+from background_ingest import cancel_background_load, progressive_dataset, rerun_while_loading
+from dataset_cache import load_threshold_index
+from ingest import UPLOAD_TYPES
+from paged_table import paged_table
+from perf import performance_panel, stage, start_run
+from schema_detect import detect_columns
+from volcano import RENDER_MODES, parse_gene_list, volcano_chart
 
 # Set page config
 st.set_page_config(page_title="Differential Gene Expression Viewer", layout="wide")
 
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Dashboard5", trace_memory=show_performance)
+
 # App title
 st.title("🧬 Differential Gene Expression Dashboard")
 st.markdown("""
@@ -13,59 +22,61 @@ The file should have columns: `Gene`, `log2FoldChange`, `padj`, and optionally `
 """)
 
 # Upload file
-uploaded_file = st.file_uploader("Upload your gene expression CSV file", type="csv")
+uploaded_file = st.file_uploader("Upload your gene expression results file (CSV, CSV.gz/.zst, Parquet or Feather)", type=UPLOAD_TYPES)
 
+loading = None  # background parse of the upload, while one is running
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
+        # Detect the needed columns from the header and a sample (cached per header)
+        with stage("detect_columns"):
+            column_map = detect_columns(uploaded_file)
 
         # Ensure required columns exist
         required_cols = {"Gene", "log2FoldChange", "padj"}
-        if not required_cols.issubset(df.columns):
+        if not required_cols.issubset(column_map.values()):
             st.error(f"Your file must contain the following columns: {required_cols}")
         else:
+            # Parse in the background; until it finishes, the view shows the rows parsed so far
+            df, loading = progressive_dataset(uploaded_file, column_map)
+
             st.success("File uploaded successfully!")
             st.dataframe(df.head())
 
-            # Convert values safely
-            df["log2FoldChange"] = pd.to_numeric(df["log2FoldChange"], errors="coerce")
-            df["padj"] = pd.to_numeric(df["padj"], errors="coerce")
-
             # Volcano plot settings
             logfc_threshold = st.slider("Log2 Fold Change Threshold", 0.0, 5.0, 1.0, 0.1)
             padj_threshold = st.slider("Adjusted P-value Threshold", 0.0, 0.1, 0.05, 0.005)
 
-            # Filtered dataframe
-            df["-log10(padj)"] = -df["padj"].apply(lambda x: np.log10(x) if x > 0 else None)
-            df["Significant"] = (
-                (df["padj"] < padj_threshold) & 
-                (abs(df["log2FoldChange"]) >= logfc_threshold)
-            )
+            # Filtered dataframe via the sorted index (binary search, padj-ordered)
+            threshold_index = load_threshold_index(uploaded_file, column_map, df)
+            with stage("significance", rows=len(df)):
+                significant_rows = threshold_index.significant_positions(padj_threshold, logfc_threshold)
+                df["Significant"] = threshold_index.mask(significant_rows)
 
             # Volcano plot
             st.subheader("Volcano Plot")
 
-            chart = alt.Chart(df).mark_circle(size=60).encode(
-                x="log2FoldChange",
-                y="-log10(padj)",
-                color=alt.condition(
-                    "datum.Significant == true",
-                    alt.value("red"),
-                    alt.value("gray")
-                ),
-                tooltip=["Gene", "log2FoldChange", "padj"]
-            ).properties(
-                width=800,
-                height=500
-            ).interactive()
-
-            st.altair_chart(chart, use_container_width=True)
+            # Significant and highlighted genes are drawn as points; large tables bin the rest
+            render_label = st.selectbox("Volcano rendering", list(RENDER_MODES))
+            highlight_genes = parse_gene_list(st.text_input("Highlight genes (comma-separated)"))
+            chart = volcano_chart(df, highlight=highlight_genes, mode=RENDER_MODES[render_label])
+
+            with stage("altair_chart"):
+                st.altair_chart(chart, use_container_width=True)
 
             # Optional: Show table of significant genes
             st.subheader("Significantly Differentially Expressed Genes")
-            st.write(df[df["Significant"]].sort_values("padj").reset_index(drop=True))
+            with stage("significant_table"):
+                paged_table(df, significant_rows, key="significant_genes")
 
     except Exception as e:
         st.error(f"Error loading file: {e}")
 else:
+    cancel_background_load()
     st.info("Please upload your CSV file to begin.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
+
+# Refresh the provisional view while the upload is still parsing
+rerun_while_loading(loading)
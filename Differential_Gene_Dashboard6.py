@@ -1,11 +1,22 @@
 import streamlit as st
-import pandas as pd
-import numpy as np  # ✅ Add this import
 import altair as alt
+import json
+
+from background_ingest import cancel_background_load, progressive_dataset, rerun_while_loading
+from dataset_cache import load_threshold_index, shared_cache
+from figure_cache import figure_key, shared_figure_cache
+from ingest import UPLOAD_TYPES
+from paged_table import paged_table
+from perf import performance_panel, stage, start_run
+from schema_detect import detect_columns
+from volcano import RENDER_MODES, parse_gene_list, volcano_chart
 
 # Set page config
 st.set_page_config(page_title="Differential Gene Expression Viewer", layout="wide")
 
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Dashboard6", trace_memory=show_performance)
+
 # App title
 st.title("🧬 Differential Gene Expression Dashboard")
 st.markdown("""
@@ -14,59 +25,74 @@ The file should have columns: `Gene`, `log2FoldChange`, `padj`, and optionally `
 """)
 
 # Upload file
-uploaded_file = st.file_uploader("Upload your gene expression CSV file", type="csv")
+uploaded_file = st.file_uploader("Upload your gene expression results file (CSV, CSV.gz/.zst, Parquet or Feather)", type=UPLOAD_TYPES)
 
+loading = None  # background parse of the upload, while one is running
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
+        # Detect the needed columns from the header and a sample (cached per header)
+        with stage("detect_columns"):
+            column_map = detect_columns(uploaded_file)
 
         # Ensure required columns exist
         required_cols = {"Gene", "log2FoldChange", "padj"}
-        if not required_cols.issubset(df.columns):
+        if not required_cols.issubset(column_map.values()):
             st.error(f"Your file must contain the following columns: {required_cols}")
         else:
+            # Parse in the background; until it finishes, the view shows the rows parsed so far
+            df, loading = progressive_dataset(uploaded_file, column_map)
+
             st.success("File uploaded successfully!")
             st.dataframe(df.head())
 
-            # Convert to numeric
-            df["log2FoldChange"] = pd.to_numeric(df["log2FoldChange"], errors="coerce")
-            df["padj"] = pd.to_numeric(df["padj"], errors="coerce")
-
             # Volcano plot settings
             logfc_threshold = st.slider("Log2 Fold Change Threshold", 0.0, 5.0, 1.0, 0.1)
             padj_threshold = st.slider("Adjusted P-value Threshold", 0.0, 0.1, 0.05, 0.005)
 
-            # Prepare volcano plot data
-            df["-log10(padj)"] = df["padj"].apply(lambda x: -np.log10(x) if x > 0 else np.nan)
-            df["Significant"] = (
-                (df["padj"] < padj_threshold) & 
-                (df["log2FoldChange"].abs() >= logfc_threshold)
-            )
+            # Prepare volcano plot data via the sorted index (binary search, padj-ordered)
+            threshold_index = load_threshold_index(uploaded_file, column_map, df)
+            with stage("significance", rows=len(df)):
+                significant_rows = threshold_index.significant_positions(padj_threshold, logfc_threshold)
+                df["Significant"] = threshold_index.mask(significant_rows)
 
             # Volcano Plot
             st.subheader("Volcano Plot")
 
-            chart = alt.Chart(df.dropna(subset=["-log10(padj)"])).mark_circle(size=60).encode(
-                x=alt.X("log2FoldChange", title="log2 Fold Change"),
-                y=alt.Y("-log10(padj)", title="-log10 Adjusted P-value"),
-                color=alt.condition(
-                    "datum.Significant == true",
-                    alt.value("red"),
-                    alt.value("gray")
-                ),
-                tooltip=["Gene", "log2FoldChange", "padj"]
-            ).properties(
-                width=800,
-                height=500
-            ).interactive()
-
-            st.altair_chart(chart, use_container_width=True)
+            # Significant and highlighted genes are drawn as points; large tables bin the rest
+            render_label = st.selectbox("Volcano rendering", list(RENDER_MODES))
+            highlight_genes = parse_gene_list(st.text_input("Highlight genes (comma-separated)"))
+
+            # Reuse the Vega-Lite spec while the dataset, thresholds and chart options are unchanged
+            def render_volcano_spec():
+                chart = volcano_chart(df, highlight=highlight_genes, mode=RENDER_MODES[render_label])
+                with stage("volcano_spec"), alt.data_transformers.disable_max_rows():
+                    return chart.to_json()  # payload is already bounded by volcano_chart
+
+            figure_cache = shared_figure_cache()
+            # Row count keeps provisional specs (drawn while the file is still parsing) apart
+            spec_key = figure_key("volcano", shared_cache().key(uploaded_file, column_map), len(df),
+                                  logfc_threshold, padj_threshold, RENDER_MODES[render_label], highlight_genes)
+            spec = figure_cache.get_or_render(spec_key, render_volcano_spec)
+            with stage("vega_lite_chart"):
+                st.vega_lite_chart(json.loads(spec), use_container_width=True)
+            cache_stats = figure_cache.stats()
+            st.caption(f"Figure cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits, "
+                       f"{cache_stats['misses']} misses")
 
             # Table of significant genes
             st.subheader("Significantly Differentially Expressed Genes")
-            st.dataframe(df[df["Significant"]].sort_values("padj").reset_index(drop=True))
+            with stage("significant_table"):
+                paged_table(df, significant_rows, key="significant_genes")
 
     except Exception as e:
         st.error(f"Error loading file: {e}")
 else:
+    cancel_background_load()
     st.info("Please upload your CSV file to begin.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
+
+# Refresh the provisional view while the upload is still parsing
+rerun_while_loading(loading)
@@ -1,11 +1,21 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import altair as alt
+
+from background_ingest import cancel_background_load, progressive_dataset, rerun_while_loading
+from dataset_cache import load_threshold_index
+from de_pipeline import regulation_mask, regulation_values
+from ingest import UPLOAD_TYPES, sniff_header
+from paged_table import paged_table
+from perf import performance_panel, stage, start_run
+from schema_detect import detect_columns
+from volcano import RENDER_MODES, parse_gene_list, volcano_chart
 
 # Set page config
 st.set_page_config(page_title="Differential Gene Expression Viewer", layout="wide")
 
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Dashboard_adjustcolumns", trace_memory=show_performance)
+
 # App title
 st.title("🧬 Differential Gene Expression Dashboard")
 st.markdown("""
@@ -14,84 +24,73 @@ Required data: gene name, log2 fold change, adjusted p-value (padj).
 Optionally: regulation column (Upregulated, Downregulated).
 """)
 
-def standardize_columns(df):
-    # Lowercase, remove spaces and unify names
-    rename_map = {}
-    for col in df.columns:
-        clean = col.strip().lower().replace(" ", "").replace("_", "")
-        if "gene" in clean:
-            rename_map[col] = "Gene"
-        elif "log2fc" in clean or "log2foldchange" in clean:
-            rename_map[col] = "log2FoldChange"
-        elif "padj" in clean:
-            rename_map[col] = "padj"
-        elif "regulation" in clean:
-            rename_map[col] = "regulation"
-    df = df.rename(columns=rename_map)
-    return df
-
 # Upload file
-uploaded_file = st.file_uploader("Upload your gene expression CSV file", type="csv")
+uploaded_file = st.file_uploader("Upload your gene expression results file (CSV, CSV.gz/.zst, Parquet or Feather)", type=UPLOAD_TYPES)
 
+loading = None  # background parse of the upload, while one is running
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
-
-        # Clean and rename columns
-        df.columns = df.columns.str.strip()
-        df = standardize_columns(df)
+        # Detect the needed columns by name and content (same rules as standardize_columns)
+        header = sniff_header(uploaded_file)
+        with stage("detect_columns"):
+            column_map = detect_columns(uploaded_file)
 
         required_cols = {"Gene", "log2FoldChange", "padj"}
-        if not required_cols.issubset(df.columns):
-            st.error(f"Your file must include at least: {required_cols}. Current columns: {list(df.columns)}")
+        if not required_cols.issubset(column_map.values()):
+            st.error(f"Your file must include at least: {required_cols}. Current columns: {[col.strip() for col in header]}")
         else:
+            # Parse in the background; until it finishes, the view shows the rows parsed so far
+            df, loading = progressive_dataset(uploaded_file, column_map)
+
             st.success("File uploaded and processed successfully.")
             st.dataframe(df.head())
 
-            # Convert to numeric safely
-            df["log2FoldChange"] = pd.to_numeric(df["log2FoldChange"], errors="coerce")
-            df["padj"] = pd.to_numeric(df["padj"], errors="coerce")
-
-            # Calculate -log10(padj)
-            df["-log10(padj)"] = df["padj"].apply(lambda x: -np.log10(x) if x > 0 else np.nan)
-
             # Set thresholds
             logfc_threshold = st.slider("Log2 Fold Change Threshold", 0.0, 5.0, 1.0, 0.1)
             padj_threshold = st.slider("Adjusted P-value Threshold", 0.0, 0.1, 0.05, 0.005)
 
-            # Mark significance
-            df["Significant"] = (
-                (df["padj"] < padj_threshold) &
-                (df["log2FoldChange"].abs() >= logfc_threshold)
-            )
+            # Mark significance via the sorted index (binary search, padj-ordered)
+            threshold_index = load_threshold_index(uploaded_file, column_map, df)
+            with stage("significance", rows=len(df)):
+                significant_rows = threshold_index.significant_positions(padj_threshold, logfc_threshold)
+                df["Significant"] = threshold_index.mask(significant_rows)
+            plotted_rows = None  # row positions the volcano plot is restricted to (None = all)
 
             # Optional regulation filter
             if "regulation" in df.columns:
-                options = ["All"] + sorted(df["regulation"].dropna().unique())
+                options = ["All"] + regulation_values(df)
                 selected_reg = st.selectbox("Filter by Regulation", options)
                 if selected_reg != "All":
-                    df = df[df["regulation"] == selected_reg]
+                    # One mask over the shared frame: plotted positions and significant rows, no filtered copy
+                    in_regulation = regulation_mask(df, selected_reg)
+                    plotted_rows = np.flatnonzero(in_regulation)
+                    significant_rows = significant_rows[in_regulation[significant_rows]]
 
             # Volcano Plot
             st.subheader("Volcano Plot")
-            chart = alt.Chart(df.dropna(subset=["-log10(padj)"])).mark_circle(size=60).encode(
-                x=alt.X("log2FoldChange", title="log2 Fold Change"),
-                y=alt.Y("-log10(padj)", title="-log10 Adjusted P-value"),
-                color=alt.condition(
-                    "datum.Significant == true",
-                    alt.value("red"),
-                    alt.value("gray")
-                ),
-                tooltip=["Gene", "log2FoldChange", "padj"]
-            ).properties(width=800, height=500).interactive()
-
-            st.altair_chart(chart, use_container_width=True)
+            # Significant and highlighted genes are drawn as points; large tables bin the rest
+            render_label = st.selectbox("Volcano rendering", list(RENDER_MODES))
+            highlight_genes = parse_gene_list(st.text_input("Highlight genes (comma-separated)"))
+            chart = volcano_chart(df, highlight=highlight_genes, mode=RENDER_MODES[render_label],
+                                  rows=plotted_rows)
+
+            with stage("altair_chart"):
+                st.altair_chart(chart, use_container_width=True)
 
             # Table of significant genes
             st.subheader("Significantly Differentially Expressed Genes")
-            st.dataframe(df[df["Significant"]].sort_values("padj").reset_index(drop=True))
+            with stage("significant_table"):
+                paged_table(df, significant_rows, key="significant_genes")
 
     except Exception as e:
         st.error(f"Error loading file: {e}")
 else:
+    cancel_background_load()
     st.info("Please upload your CSV file to begin.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
+
+# Refresh the provisional view while the upload is still parsing
+rerun_while_loading(loading)
@@ -1,10 +1,20 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import altair as alt
+
+from background_ingest import cancel_background_load, progressive_dataset, rerun_while_loading
+from dataset_cache import load_threshold_index
+from de_pipeline import regulation_mask, regulation_values
+from ingest import UPLOAD_TYPES, preview_rows, sniff_header
+from paged_table import paged_table
+from perf import performance_panel, stage, start_run
+from schema_detect import detect_columns
+from volcano import RENDER_MODES, parse_gene_list, volcano_chart
 
 st.set_page_config(page_title="Flexible Gene Expression Dashboard", layout="wide")
 
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Dashboard_allcolumns", trace_memory=show_performance)
+
 st.title("🧬 Adaptive Differential Gene Expression Viewer")
 st.markdown("""
 Upload a CSV file containing differential gene expression results.  
@@ -15,82 +25,102 @@ Then, select the correct columns for:
 (Optional: regulation for filtering)
 """)
 
-uploaded_file = st.file_uploader("Upload CSV file", type="csv")
+uploaded_file = st.file_uploader("Upload results file (CSV, CSV.gz/.zst, Parquet or Feather)", type=UPLOAD_TYPES)
 
+loading = None  # background parse of the upload, while one is running
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
-        df.columns = df.columns.str.strip()
+        # Sniff the header and preview a few rows without parsing the whole file
+        header = sniff_header(uploaded_file)
+        raw_columns = {col.strip(): col for col in header}
+        preview = preview_rows(uploaded_file)
+        preview.columns = preview.columns.str.strip()
 
         st.success("File uploaded successfully!")
         st.write("Preview of your data:")
-        st.dataframe(df.head())
+        st.dataframe(preview)
 
         # Column selectors
-        all_cols = list(df.columns)
+        all_cols = list(raw_columns)
+
+        # Preselect the detected columns (cached per header, so reruns skip detection)
+        with stage("detect_columns"):
+            detected = {name: col.strip() for col, name in detect_columns(uploaded_file).items()}
+
+        def detected_index(name, offset=0):
+            return all_cols.index(detected[name]) + offset if name in detected else 0
 
-        gene_col = st.selectbox("Select Gene Name Column", all_cols)
-        logfc_col = st.selectbox("Select Log2 Fold Change Column", all_cols)
-        padj_col = st.selectbox("Select Adjusted P-value (padj) Column", all_cols)
+        gene_col = st.selectbox("Select Gene Name Column", all_cols, index=detected_index("Gene"))
+        logfc_col = st.selectbox("Select Log2 Fold Change Column", all_cols,
+                                 index=detected_index("log2FoldChange"))
+        padj_col = st.selectbox("Select Adjusted P-value (padj) Column", all_cols, index=detected_index("padj"))
 
         regulation_col = st.selectbox(
             "Optional: Select Regulation Column (Up/Downregulated)",
-            ["None"] + all_cols
+            ["None"] + all_cols,
+            index=detected_index("regulation", offset=1)
         )
 
-        # Rename columns internally
-        df = df.rename(columns={
-            gene_col: "Gene",
-            logfc_col: "log2FoldChange",
-            padj_col: "padj"
-        })
+        # Map the selected columns to standard names; only these are parsed
+        column_map = {
+            raw_columns[gene_col]: "Gene",
+            raw_columns[logfc_col]: "log2FoldChange",
+            raw_columns[padj_col]: "padj"
+        }
 
         if regulation_col != "None":
-            df = df.rename(columns={regulation_col: "regulation"})
+            column_map[raw_columns[regulation_col]] = "regulation"
 
-        # Convert to numeric
-        df["log2FoldChange"] = pd.to_numeric(df["log2FoldChange"], errors="coerce")
-        df["padj"] = pd.to_numeric(df["padj"], errors="coerce")
-        df["-log10(padj)"] = df["padj"].apply(lambda x: -np.log10(x) if x > 0 else np.nan)
+        # Parse in the background; until it finishes, the view shows the rows parsed so far
+        df, loading = progressive_dataset(uploaded_file, column_map)
 
         # Set thresholds
         st.markdown("### Filter Options")
         logfc_threshold = st.slider("Log2 Fold Change Threshold", 0.0, 5.0, 1.0, 0.1)
         padj_threshold = st.slider("Adjusted P-value Threshold", 0.0, 0.1, 0.05, 0.005)
 
-        # Define significance
-        df["Significant"] = (
-            (df["padj"] < padj_threshold) &
-            (df["log2FoldChange"].abs() >= logfc_threshold)
-        )
+        # Define significance via the sorted index (binary search, padj-ordered)
+        threshold_index = load_threshold_index(uploaded_file, column_map, df)
+        with stage("significance", rows=len(df)):
+            significant_rows = threshold_index.significant_positions(padj_threshold, logfc_threshold)
+            df["Significant"] = threshold_index.mask(significant_rows)
+        plotted_rows = None  # row positions the volcano plot is restricted to (None = all)
 
         # Optional regulation filter
         if "regulation" in df.columns:
-            values = ["All"] + sorted(df["regulation"].dropna().unique())
+            values = ["All"] + regulation_values(df)
             selected = st.selectbox("Filter by Regulation", values)
             if selected != "All":
-                df = df[df["regulation"] == selected]
+                # One mask over the shared frame: plotted positions and significant rows, no filtered copy
+                in_regulation = regulation_mask(df, selected)
+                plotted_rows = np.flatnonzero(in_regulation)
+                significant_rows = significant_rows[in_regulation[significant_rows]]
 
         # Volcano Plot
         st.markdown("### Volcano Plot")
-        volcano = alt.Chart(df.dropna(subset=["-log10(padj)"])).mark_circle(size=60).encode(
-            x=alt.X("log2FoldChange", title="log2 Fold Change"),
-            y=alt.Y("-log10(padj)", title="-log10 Adjusted P-value"),
-            color=alt.condition(
-                "datum.Significant == true",
-                alt.value("red"),
-                alt.value("gray")
-            ),
-            tooltip=["Gene", "log2FoldChange", "padj"]
-        ).properties(width=800, height=500).interactive()
-
-        st.altair_chart(volcano, use_container_width=True)
+        # Significant and highlighted genes are drawn as points; large tables bin the rest
+        render_label = st.selectbox("Volcano rendering", list(RENDER_MODES))
+        highlight_genes = parse_gene_list(st.text_input("Highlight genes (comma-separated)"))
+        volcano = volcano_chart(df, highlight=highlight_genes, mode=RENDER_MODES[render_label],
+                                rows=plotted_rows)
+
+        with stage("altair_chart"):
+            st.altair_chart(volcano, use_container_width=True)
 
         # Table of significant genes
         st.markdown("### Significant Genes")
-        st.dataframe(df[df["Significant"]].sort_values("padj").reset_index(drop=True))
+        with stage("significant_table"):
+            paged_table(df, significant_rows, key="significant_genes")
 
     except Exception as e:
         st.error(f"An error occurred: {e}")
 else:
+    cancel_background_load()
     st.info("Please upload a CSV file to begin.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
+
+# Refresh the provisional view while the upload is still parsing
+rerun_while_loading(loading)
@@ -0,0 +1,127 @@
+import streamlit as st
+import numpy as np
+import altair as alt
+import json
+
+from contrasts import load_contrasts
+from dataset_registry import session_holder, shared_registry
+from figure_cache import figure_key, shared_figure_cache
+from ingest import UPLOAD_TYPES
+from paged_table import paged_table
+from perf import performance_panel, stage, start_run
+from volcano import RENDER_MODES, parse_gene_list, volcano_chart
+
+# Genes shown in the cross-contrast heatmap
+HEATMAP_GENES = 50
+
+# Set page config
+st.set_page_config(page_title="Multi-Contrast Differential Expression Viewer", layout="wide")
+
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Dashboard_contrasts", trace_memory=show_performance)
+
+# App title
+st.title("🧬 Multi-Contrast Differential Expression Dashboard")
+st.markdown("""
+Upload one differential expression results file per contrast (e.g. each cancer type vs normal),
+or one long table with a `contrast` column.
+Each file should have columns: `Gene`, `log2FoldChange`, `padj`, and optionally `regulation`.
+Files without a `contrast` column are named after the file.
+""")
+
+# Upload files
+uploaded_files = st.file_uploader("Upload your gene expression results files (CSV, CSV.gz/.zst, Parquet or Feather)",
+                                  type=UPLOAD_TYPES, accept_multiple_files=True)
+
+if uploaded_files:
+    try:
+        # All contrasts are parsed once into one frame keyed by a categorical contrast column,
+        # shared read-only with any other session that uploads the same files
+        progress_bar = st.progress(0.0, text="Parsing files...")
+        contrasts = load_contrasts(uploaded_files,
+                                   progress=lambda f: progress_bar.progress(f, text=f"Parsing files... {f:.0%}"),
+                                   holder=session_holder("contrasts"))
+        progress_bar.empty()
+        st.success(f"Loaded {len(contrasts)} contrasts ({len(contrasts.frame):,} rows).")
+
+        # Volcano plot settings
+        logfc_threshold = st.slider("Log2 Fold Change Threshold", 0.0, 5.0, 1.0, 0.1)
+        padj_threshold = st.slider("Adjusted P-value Threshold", 0.0, 0.1, 0.05, 0.005)
+
+        # Switching contrast slices the loaded frame; nothing is re-parsed
+        selected_contrast = st.selectbox("Contrast", contrasts.contrasts)
+        df = contrasts.contrast_frame(selected_contrast)
+        threshold_index = contrasts.threshold_index(selected_contrast)
+        with stage("significance", rows=len(df)):
+            significant_rows = threshold_index.significant_positions(padj_threshold, logfc_threshold)
+            df["Significant"] = threshold_index.mask(significant_rows)
+
+        # Volcano Plot
+        st.subheader(f"Volcano Plot: {selected_contrast}")
+
+        # Significant and highlighted genes are drawn as points; large tables bin the rest
+        render_label = st.selectbox("Volcano rendering", list(RENDER_MODES))
+        highlight_genes = parse_gene_list(st.text_input("Highlight genes (comma-separated)"))
+
+        # Reuse the Vega-Lite spec while the contrast, thresholds and chart options are unchanged
+        def render_volcano_spec():
+            chart = volcano_chart(df, highlight=highlight_genes, mode=RENDER_MODES[render_label])
+            with stage("volcano_spec"), alt.data_transformers.disable_max_rows():
+                return chart.to_json()  # payload is already bounded by volcano_chart
+
+        figure_cache = shared_figure_cache()
+        spec_key = figure_key("volcano", contrasts.key, selected_contrast, logfc_threshold, padj_threshold,
+                              RENDER_MODES[render_label], highlight_genes)
+        spec = figure_cache.get_or_render(spec_key, render_volcano_spec)
+        with stage("vega_lite_chart"):
+            st.vega_lite_chart(json.loads(spec), use_container_width=True)
+
+        # Table of significant genes
+        st.subheader("Significantly Differentially Expressed Genes")
+        with stage("significant_table"):
+            paged_table(df, significant_rows, key="significant_genes",
+                        file_name=f"significant_genes_{selected_contrast}.csv")
+
+        # Cross-contrast comparison from the gene x contrast summary (built once per upload)
+        st.subheader("Cross-Contrast Comparison")
+        with stage("cross_contrast", rows=len(contrasts.frame)):
+            log2fc = contrasts.summary_frame("log2FoldChange")
+            counts = contrasts.significant_counts(logfc_threshold, padj_threshold)
+            min_contrasts = 1
+            if len(contrasts) > 1:
+                min_contrasts = st.slider("Significant in at least N contrasts", 1, len(contrasts), 1)
+            shared = np.flatnonzero(counts >= min_contrasts)
+            # Most consistently significant genes first, then by their largest |log2FC|
+            strength = np.nan_to_num(np.nanmax(np.abs(log2fc.to_numpy()[shared]), axis=1, initial=0.0))
+            shared = shared[np.lexsort((-strength, -counts[shared]))]
+
+            comparison = contrasts.summary_table()
+            comparison.insert(1, "Significant contrasts", counts)
+        st.caption(f"{len(shared):,} genes significant in at least {min_contrasts} of {len(contrasts)} contrasts")
+
+        if len(shared):
+            heatmap_df = log2fc.iloc[shared[:HEATMAP_GENES]].reset_index().melt(
+                id_vars="Gene", var_name="Contrast", value_name="log2FoldChange")
+            limit = float(np.nanmax(np.abs(heatmap_df["log2FoldChange"]))) or 1.0
+            heatmap = alt.Chart(heatmap_df).mark_rect().encode(
+                x=alt.X("Contrast:N", sort=contrasts.contrasts),
+                y=alt.Y("Gene:N", sort=list(heatmap_df["Gene"].drop_duplicates())),
+                color=alt.Color("log2FoldChange:Q", scale=alt.Scale(scheme="redblue", reverse=True,
+                                                                   domain=[-limit, limit])),
+                tooltip=["Gene", "Contrast", "log2FoldChange"],
+            ).properties(height=max(200, 14 * min(len(shared), HEATMAP_GENES)))
+            with stage("altair_chart"):
+                st.altair_chart(heatmap, use_container_width=True)
+
+        with stage("cross_contrast_table"):
+            paged_table(comparison, shared, key="cross_contrast", file_name="cross_contrast_summary.csv")
+
+    except Exception as e:
+        st.error(f"Error loading files: {e}")
+else:
+    shared_registry().release(session_holder("contrasts"))
+    st.info("Please upload one or more result files to begin.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
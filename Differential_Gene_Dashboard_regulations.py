@@ -1,84 +1,139 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import altair as alt
+
+from appending_results import WATCH_ROOT, watched_results
+from background_ingest import cancel_background_load, progressive_dataset, rerun_while_loading
+from dataset_cache import load_threshold_index
+from de_pipeline import regulation_mask, regulation_values
+from ingest import UPLOAD_TYPES
+from paged_table import paged_table
+from perf import performance_panel, stage, start_run
+from schema_detect import detect_columns
+from volcano import RENDER_MODES, parse_gene_list, volcano_chart
 
 # Set page config
 st.set_page_config(page_title="Differential Gene Expression Viewer", layout="wide")
 
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Dashboard_regulations", trace_memory=show_performance)
+
 # App title
 st.title("🧬 Differential Gene Expression Dashboard")
 st.markdown("""
-Upload a CSV file containing differential gene expression results.  
+Upload a CSV file containing differential gene expression results, or watch a local CSV
+that a running pipeline appends to.  
 Required columns: `Gene`, `log2FoldChange`, `padj`, and optionally `regulation`.
 """)
 
-# Upload file
-uploaded_file = st.file_uploader("Upload your gene expression CSV file", type="csv")
-
-if uploaded_file:
-    try:
-        df = pd.read_csv(uploaded_file)
-
-        # Check required columns
-        required_cols = {"Gene", "log2FoldChange", "padj"}
-        if not required_cols.issubset(df.columns):
-            st.error(f"Your file must contain the following columns: {required_cols}")
-        else:
-            st.success("File uploaded successfully.")
-            st.dataframe(df.head())
-
-            # Ensure numeric types
-            df["log2FoldChange"] = pd.to_numeric(df["log2FoldChange"], errors="coerce")
-            df["padj"] = pd.to_numeric(df["padj"], errors="coerce")
-
-            # Compute -log10(padj)
-            df["-log10(padj)"] = df["padj"].apply(lambda x: -np.log10(x) if x > 0 else np.nan)
-
-            # Threshold sliders
-            logfc_threshold = st.slider("Log2 Fold Change Threshold", 0.0, 5.0, 1.0, 0.1)
-            padj_threshold = st.slider("Adjusted P-value Threshold", 0.0, 0.1, 0.05, 0.005)
-
-            # Compute significance
-            df["Significant"] = (
-                (df["padj"] < padj_threshold) &
-                (df["log2FoldChange"].abs() >= logfc_threshold)
-            )
-
-            # Regulation filter
-            if "regulation" in df.columns:
-                options = ["All"] + sorted(df["regulation"].dropna().unique())
-                selected_regulation = st.selectbox("Filter by Regulation", options)
-
-                if selected_regulation != "All":
-                    df = df[df["regulation"] == selected_regulation]
-            else:
-                st.warning("No 'regulation' column found — skipping regulation filter.")
-
-            # Volcano plot
-            st.subheader("Volcano Plot")
-
-            chart = alt.Chart(df.dropna(subset=["-log10(padj)"])).mark_circle(size=60).encode(
-                x=alt.X("log2FoldChange", title="log2 Fold Change"),
-                y=alt.Y("-log10(padj)", title="-log10 Adjusted P-value"),
-                color=alt.condition(
-                    "datum.Significant == true",
-                    alt.value("red"),
-                    alt.value("gray")
-                ),
-                tooltip=["Gene", "log2FoldChange", "padj"]
-            ).properties(
-                width=800,
-                height=500
-            ).interactive()
-
-            st.altair_chart(chart, use_container_width=True)
-
-            # Significant gene table
-            st.subheader("Significantly Differentially Expressed Genes")
-            st.dataframe(df[df["Significant"]].sort_values("padj").reset_index(drop=True))
-
-    except Exception as e:
-        st.error(f"Error loading file: {e}")
+UPLOAD_SOURCE = "Upload file"
+WATCH_SOURCE = "Watch local file"
+source = st.sidebar.radio("Data source", [UPLOAD_SOURCE, WATCH_SOURCE])
+
+
+def show_results(df, threshold_index):
+    """Threshold sliders, regulation filter, volcano plot and significant gene table of `df`."""
+    # Threshold sliders
+    logfc_threshold = st.slider("Log2 Fold Change Threshold", 0.0, 5.0, 1.0, 0.1)
+    padj_threshold = st.slider("Adjusted P-value Threshold", 0.0, 0.1, 0.05, 0.005)
+
+    # Compute significance via the sorted index (binary search, padj-ordered)
+    with stage("significance", rows=len(df)):
+        significant_rows = threshold_index.significant_positions(padj_threshold, logfc_threshold)
+        df["Significant"] = threshold_index.mask(significant_rows)
+    plotted_rows = None  # row positions the volcano plot is restricted to (None = all)
+    st.caption(f"{len(significant_rows):,} of {len(df):,} genes significant")
+
+    # Regulation filter
+    if "regulation" in df.columns:
+        options = ["All"] + regulation_values(df)
+        selected_regulation = st.selectbox("Filter by Regulation", options)
+
+        if selected_regulation != "All":
+            # One mask over the shared frame: plotted positions and significant rows, no filtered copy
+            in_regulation = regulation_mask(df, selected_regulation)
+            plotted_rows = np.flatnonzero(in_regulation)
+            significant_rows = significant_rows[in_regulation[significant_rows]]
+    else:
+        st.warning("No 'regulation' column found — skipping regulation filter.")
+
+    # Volcano plot
+    st.subheader("Volcano Plot")
+
+    # Significant and highlighted genes are drawn as points; large tables bin the rest
+    render_label = st.selectbox("Volcano rendering", list(RENDER_MODES))
+    highlight_genes = parse_gene_list(st.text_input("Highlight genes (comma-separated)"))
+    chart = volcano_chart(df, highlight=highlight_genes, mode=RENDER_MODES[render_label],
+                          rows=plotted_rows)
+
+    with stage("altair_chart"):
+        st.altair_chart(chart, use_container_width=True)
+
+    # Significant gene table
+    st.subheader("Significantly Differentially Expressed Genes")
+    with stage("significant_table"):
+        paged_table(df, significant_rows, key="significant_genes")
+
+
+loading = None  # background parse of the upload, while one is running
+if source == WATCH_SOURCE:
+    watch_path = st.text_input("Path of the results CSV to watch", help=f"Files under {WATCH_ROOT} (set DGE_WATCH_ROOT to change)")
+    refresh_seconds = st.number_input("Refresh every (seconds)", min_value=1, max_value=3600, value=5)
+
+    if watch_path:
+        # Only this fragment reruns on the timer: appended rows are parsed and merged, not reloaded
+        @st.fragment(run_every=refresh_seconds)
+        def watched_view():
+            try:
+                watched = watched_results(watch_path)
+                appended = watched.refresh()
+                df, threshold_index, regulation_counts = watched.snapshot()
+                if df is None:
+                    st.info("Waiting for rows to be written...")
+                    return
+                st.caption(f"{len(df):,} rows, {appended:,} new since the last refresh "
+                           f"(read up to byte {watched.offset:,})")
+                if regulation_counts:
+                    st.caption("Regulation: " + ", ".join(f"{name} {count:,}"
+                                                          for name, count in sorted(regulation_counts.items())))
+                show_results(df, threshold_index)
+            except Exception as e:
+                st.error(f"Error reading file: {e}")
+
+        watched_view()
+    else:
+        st.info("Enter the path of a results CSV to begin.")
 else:
-    st.info("Please upload your CSV file to begin.")
+    # Upload file
+    uploaded_file = st.file_uploader("Upload your gene expression results file (CSV, CSV.gz/.zst, Parquet or Feather)", type=UPLOAD_TYPES)
+
+    if uploaded_file:
+        try:
+            # Detect the needed columns from the header and a sample (cached per header)
+            with stage("detect_columns"):
+                column_map = detect_columns(uploaded_file)
+
+            # Check required columns
+            required_cols = {"Gene", "log2FoldChange", "padj"}
+            if not required_cols.issubset(column_map.values()):
+                st.error(f"Your file must contain the following columns: {required_cols}")
+            else:
+                # Parse in the background; until it finishes, the view shows the rows parsed so far
+                df, loading = progressive_dataset(uploaded_file, column_map)
+
+                st.success("File uploaded successfully.")
+                st.dataframe(df.head())
+
+                show_results(df, load_threshold_index(uploaded_file, column_map, df))
+
+        except Exception as e:
+            st.error(f"Error loading file: {e}")
+    else:
+        cancel_background_load()
+        st.info("Please upload your CSV file to begin.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
+
+# Refresh the provisional view while the upload is still parsing
+rerun_while_loading(loading)
@@ -1,10 +1,20 @@
 import streamlit as st
-import pandas as pd
 import altair as alt
 
+from gene_index import ANNOTATION_PATH, GeneSearchIndex, load_annotation
+from ingest import UPLOAD_TYPES, preview_rows, sniff_header
+from matrix_store import open_matrix
+from perf import performance_panel, stage, start_run
+
+# Columns shown in the upload preview at most
+PREVIEW_COLUMNS = 20
+
 # Page configuration
 st.set_page_config(page_title="Gene Expression Dashboard", layout="wide")
 
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Epression_Analysis", trace_memory=show_performance)
+
 # Title and instructions
 st.title("🧬 Gene Expression Dashboard")
 st.markdown("""
@@ -13,48 +23,82 @@ Upload your gene expression CSV file to explore expression levels across samples
 - Columns = gene names (one column should be sample IDs or labels)
 """)
 
+@st.cache_resource(show_spinner=False)
+def load_gene_index(store_path, annotation_path, _genes):
+    """Search index over the dataset's genes (and optional annotation), built once per converted matrix."""
+    annotation = load_annotation(annotation_path) if annotation_path else None
+    return GeneSearchIndex(_genes, annotation)
+
 # File uploader
-uploaded_file = st.file_uploader("Upload CSV", type="csv")
+uploaded_file = st.file_uploader("Upload CSV", type=UPLOAD_TYPES)
 
 # Main logic
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
+        # Only the header and a few rows are parsed here; the matrix itself is read from disk
+        with stage("sniff_header"):
+            header = sniff_header(uploaded_file)
 
-        
         # Check if there are at least 2 columns
-        if df.shape[1] < 2:
+        if len(header) < 2:
             st.error("The file must contain at least one sample ID column and one gene expression column.")
         else:
-            # Display a preview of the dataset
+            # Display a preview of the dataset (leading columns only: wide files have tens of thousands)
             st.success("File uploaded successfully.")
-            st.dataframe(df.head())
+            st.dataframe(preview_rows(uploaded_file, columns=header[:PREVIEW_COLUMNS]))
+            if len(header) > PREVIEW_COLUMNS:
+                st.caption(f"Showing the first {PREVIEW_COLUMNS} of {len(header):,} columns")
 
-            # Let user pick which column is the sample ID
-            sample_col = st.selectbox("Select the sample ID column", df.columns)
-            gene_cols = [col for col in df.columns if col != sample_col]
+            # The first column is the sample ID unless overridden; the header itself is never sent to the browser
+            sample_col = st.text_input("Sample ID column", value=header[0],
+                                       help="Defaults to the first column; type another column name to override")
 
-            # Let user select gene to visualize
-            gene = st.selectbox("Select a gene to visualize", gene_cols)
+            if sample_col not in header:
+                st.error(f"The file has no column named '{sample_col}'.")
+            else:
+                # Convert once to the memory-mapped genes x samples store (cached on disk)
+                progress_bar = st.progress(0.0, text="Preparing expression matrix...")
+                with stage("open_matrix"):
+                    store = open_matrix(uploaded_file, sample_col,
+                                        progress=lambda f: progress_bar.progress(f, text="Preparing expression matrix..."))
+                progress_bar.empty()
+                gene_index = load_gene_index(store.path, ANNOTATION_PATH, store.genes)
 
-            # Prepare data for plotting
-            chart_data = df[[sample_col, gene]].copy()
-            chart_data.columns = ["Sample", "Expression"]
+                # Search the genes server-side; only the top matches are sent to the selectbox
+                query = st.text_input("Search genes (symbol, alias or Ensembl ID)")
+                matches = gene_index.search(query)
+                labels = {gene: gene if key in (None, gene.lower()) else f"{gene} ({key})" for gene, key in matches}
 
-            # Create bar chart
-            chart = alt.Chart(chart_data).mark_bar().encode(
-                x=alt.X("Sample:N", sort=None),
-                y="Expression:Q",
-                tooltip=["Sample", "Expression"]
-            ).properties(
-                title=f"Expression of {gene}",
-                width=800,
-                height=400
-            )
+                if not matches:
+                    st.warning(f"No genes match '{query}'.")
+                else:
+                    # Let user select gene to visualize
+                    gene = st.selectbox("Select a gene to visualize", list(labels), format_func=labels.get)
+                    st.caption(f"Showing {len(matches)} of {len(gene_index):,} genes")
 
-            st.altair_chart(chart, use_container_width=True)
+                    # Prepare data for plotting (reads only this gene's row from disk)
+                    with stage("gene_frame"):
+                        chart_data = store.gene_frame(gene)
+
+                    # Create bar chart
+                    chart = alt.Chart(chart_data).mark_bar().encode(
+                        x=alt.X("Sample:N", sort=None),
+                        y="Expression:Q",
+                        tooltip=["Sample", "Expression"]
+                    ).properties(
+                        title=f"Expression of {gene}",
+                        width=800,
+                        height=400
+                    )
+
+                    with stage("altair_chart"):
+                        st.altair_chart(chart, use_container_width=True)
 
     except Exception as e:
         st.error(f"An error occurred while processing the file: {e}")
 else:
     st.info("Please upload a gene expression CSV file to begin.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
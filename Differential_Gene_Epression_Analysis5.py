@@ -1,12 +1,20 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
+
+from aggregate_cube import AggregateCube
+from boxplots import STYLES, render_gene_boxplots
+from dataset_handle import HASH_FUNCS, store_handle
+from de_engine import TESTS, differential_expression_matrix
+from expression_store import ExpressionStore
+from figure_cache import shared_figure_cache
+from mock_data import generate_mock_cohort
+from perf import performance_panel, stage, start_run
 
 # --- Configuration & Styling ---
 st.set_page_config(layout="wide", page_title="Bioinformatics Gene Expression Dashboard")
 
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Epression_Analysis5", trace_memory=show_performance)
+
 # Custom CSS for better aesthetics (Tailwind-like feel with rounded corners, shadows)
 st.markdown("""
     <style>
@@ -93,71 +101,34 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # --- Data Loading (Simulated for demonstration. In a real app, load your actual CSV/data) ---
-@st.cache_data # Cache data to improve performance, runs only once
-def load_mock_data():
+@st.cache_resource # Built once and shared read-only by every session (no per-run copy)
+def load_expression_store():
     """
-    Generates a mock gene expression dataset for demonstration.
+    Generates a mock gene expression dataset for demonstration and packs it into an
+    ExpressionStore (float32 genes x samples matrix + categorical sample metadata).
     In a real application, you would load your pre-processed gene expression data,
-    e.g., df = pd.read_csv('your_gene_expression_data.csv').
+    e.g., df = pd.read_csv('your_gene_expression_data.csv'), and convert it the same way.
+    Larger synthetic cohorts (e.g. 20k genes x 1,000 patients) can be built with
+    mock_data.generate_mock_cohort for load testing.
+    """
+    return ExpressionStore.from_long(generate_mock_cohort(n_genes=100, n_patients=25, rng=42))
+
+@st.cache_resource(hash_funcs=HASH_FUNCS) # Summaries of every (cancer type, gene, sample type) block, computed once
+def load_aggregate_cube(dataset):
+    """
+    Per-cancer-type counts, sums, squared deviations and box plot quantiles of the store
+    behind the `dataset` handle (see aggregate_cube.py), from which every cancer type
+    selection is answered.
     """
-    np.random.seed(42) # for reproducibility
-    genes = [f'Gene{i}' for i in range(1, 101)] # 100 mock genes
-    patient_ids = [f'Patient{i}' for i in range(1, 26)] # 25 mock patients
-    cancer_types = ['Breast Cancer', 'Lung Cancer', 'Colon Cancer', 'Prostate Cancer']
-    sample_types = ['Tumor', 'Normal']
-
-    data = []
-    for patient in patient_ids:
-        # Assign a random cancer type to each patient (for simplicity in mock data)
-        patient_cancer_type = np.random.choice(cancer_types)
-        for gene in genes:
-            # Simulate different expression patterns based on gene, sample type, and cancer type
-            base_expr_normal = np.random.uniform(5, 50) # Base expression for normal tissue
-            base_expr_tumor = base_expr_normal * np.random.uniform(0.8, 1.2) # Small variation for non-DE genes
-
-            # Introduce differential expression for specific genes
-            if gene in ['Gene1', 'Gene2', 'Gene3', 'Gene4', 'Gene5']: # Highly upregulated in some cancers
-                if patient_cancer_type == 'Breast Cancer' and gene in ['Gene1', 'Gene2']:
-                    tumor_expr = np.random.normal(loc=base_expr_normal * 5, scale=base_expr_normal * 0.5)
-                elif patient_cancer_type == 'Lung Cancer' and gene == 'Gene3':
-                    tumor_expr = np.random.normal(loc=base_expr_normal * 4, scale=base_expr_normal * 0.4)
-                else:
-                    tumor_expr = np.random.normal(loc=base_expr_normal * np.random.uniform(0.9, 1.1), scale=base_expr_normal * 0.1) # Small change
-                normal_expr = np.random.normal(loc=base_expr_normal, scale=base_expr_normal * 0.1)
-
-            elif gene in ['Gene10', 'Gene11', 'Gene12']: # Downregulated in some cancers
-                if patient_cancer_type == 'Colon Cancer' and gene == 'Gene10':
-                    tumor_expr = np.random.normal(loc=base_expr_normal * 0.2, scale=base_expr_normal * 0.05)
-                else:
-                    tumor_expr = np.random.normal(loc=base_expr_normal * np.random.uniform(0.9, 1.1), scale=base_expr_normal * 0.1) # Small change
-                normal_expr = np.random.normal(loc=base_expr_normal, scale=base_expr_normal * 0.1)
-            else: # Rest are mostly stable
-                tumor_expr = np.random.normal(loc=base_expr_tumor, scale=base_expr_tumor * 0.1)
-                normal_expr = np.random.normal(loc=base_expr_normal, scale=base_expr_normal * 0.1)
-
-            # Ensure non-negative expression values
-            tumor_expr = max(0.1, tumor_expr)
-            normal_expr = max(0.1, normal_expr)
-
-            data.append({'Gene': gene,
-                         'Sample_ID': f'{patient}_{patient_cancer_type}_Tumor',
-                         'Expression_Value': tumor_expr,
-                         'Sample_Type': 'Tumor',
-                         'Cancer_Type': patient_cancer_type})
-            data.append({'Gene': gene,
-                         'Sample_ID': f'{patient}_{patient_cancer_type}_Normal',
-                         'Expression_Value': normal_expr,
-                         'Sample_Type': 'Normal',
-                         'Cancer_Type': patient_cancer_type})
-
-    df_raw = pd.DataFrame(data)
-
-    # Convert expression values to log2 for better visualization of differences
-    df_raw['Log2_Expression'] = np.log2(df_raw['Expression_Value'])
-    return df_raw
+    return AggregateCube.from_store(dataset.source)
 
 # Load data when the app starts (or from cache if already loaded)
-df = load_mock_data()
+with stage("load_expression_store"):
+    store = load_expression_store()
+    # Cached functions take this handle: lookups hash the store's digest, not its matrix
+    dataset = store_handle(store)
+with stage("load_aggregate_cube"):
+    cube = load_aggregate_cube(dataset)
 
 # --- Dashboard Title & Introduction ---
 st.title("🔬 Interactive Gene Expression Dashboard")
@@ -175,60 +146,62 @@ st.sidebar.header("Dashboard Controls")
 st.sidebar.markdown("Use the options below to filter data and select genes for visualization.")
 
 # Select Cancer Type
-all_cancer_types_options = ['All Cancer Types'] + sorted(df['Cancer_Type'].unique().tolist())
+all_cancer_types_options = ['All Cancer Types'] + sorted(store.cancer_types)
 selected_cancer_type = st.sidebar.selectbox(
     "Select Cancer Type:",
     all_cancer_types_options,
     help="Filter data by a specific cancer type."
 )
 
-# Filter data based on selected cancer type
-if selected_cancer_type == 'All Cancer Types':
-    filtered_df = df.copy()
-else:
-    filtered_df = df[df['Cancer_Type'] == selected_cancer_type].copy()
+# Filter data based on selected cancer type (a column slice of the shared matrix, no copy)
+cancer_filter = None if selected_cancer_type == 'All Cancer Types' else selected_cancer_type
+filtered_store = store.cancer_view(cancer_filter)
+
+# Statistical test used to rank genes (Tumor vs Normal)
+selected_test = st.sidebar.selectbox(
+    "Differential Expression Test:",
+    list(TESTS),
+    help="Welch's t-test or Mann-Whitney U per gene, with Benjamini-Hochberg adjusted p-values."
+)
 
-# Identify top differentially expressed genes (mock calculation for demo)
-@st.cache_data(show_spinner=False) # Cache the result and hide spinner for speed
-def get_mock_differential_genes(dataframe):
+# Identify top differentially expressed genes
+@st.cache_data(show_spinner=False, hash_funcs=HASH_FUNCS) # Cache the result and hide spinner for speed
+def get_differential_genes(selection, test):
     """
-    A highly simplified mock function to identify "differential" genes.
-    In a real bioinformatics pipeline, this would involve robust statistical
-    tests like t-tests, DESeq2, or edgeR to calculate fold changes and p-values.
+    Tests every gene for Tumor vs Normal expression in one batched computation and returns
+    the results table (Gene, log2FoldChange, padj, ...) sorted by adjusted p-value.
+    The Welch t-test combines the precomputed cube; Mann-Whitney needs ranks, so it runs
+    on the matrix columns of the selection (see de_engine.differential_expression_matrix).
+    `selection` is a dataset handle with a cancer_type filter, so the cache lookup hashes
+    the dataset fingerprint and the filter rather than any arrays.
     """
-    if dataframe.empty:
-        return []
-
-    # Calculate mean expression for Tumor and Normal samples
-    avg_expr = dataframe.groupby(['Gene', 'Sample_Type'])['Log2_Expression'].mean().unstack()
-
-    # Calculate mock log2 fold change (Tumor vs Normal)
-    if 'Tumor' in avg_expr.columns and 'Normal' in avg_expr.columns:
-        avg_expr['Log2_Fold_Change'] = avg_expr['Tumor'] - avg_expr['Normal']
-        # Sort by absolute fold change to get potentially "most differential" genes
-        # For a real scenario, you'd filter by p-value and then fold change
-        sorted_genes = avg_expr.sort_values(by='Log2_Fold_Change', ascending=False).index.tolist()
-        return sorted_genes
-    return []
-
-top_mock_differential_genes = get_mock_differential_genes(filtered_df)
-
-# Default genes for selection based on mock data that should show differences
+    cancer_type = selection.filter("cancer_type")
+    if TESTS[test] == "welch":
+        return load_aggregate_cube(store_handle(selection.source)).differential_expression(cancer_type)
+    view = selection.source.cancer_view(cancer_type)
+    return differential_expression_matrix(view.genes, view.samples['Sample_Type'].to_numpy(),
+                                          view.matrix, test=TESTS[test])
+
+with stage("differential_expression"):
+    de_results = get_differential_genes(dataset.where(cancer_type=cancer_filter), selected_test)
+top_differential_genes = de_results['Gene'].tolist()
+
+# Default genes for selection: known differential mock genes, then the lowest padj
 default_genes_for_selection = []
-if top_mock_differential_genes:
+if top_differential_genes:
     # Attempt to pre-select a few genes that are known to be differential in the mock data
     priority_genes = ['Gene1', 'Gene2', 'Gene3', 'Gene10', 'Gene11']
-    default_genes_for_selection = [gene for gene in priority_genes if gene in top_mock_differential_genes]
+    default_genes_for_selection = [gene for gene in priority_genes if gene in top_differential_genes]
     # If less than 3, add more from the top
     if len(default_genes_for_selection) < 3:
-        for gene in top_mock_differential_genes:
+        for gene in top_differential_genes:
             if gene not in default_genes_for_selection:
                 default_genes_for_selection.append(gene)
             if len(default_genes_for_selection) >= 3:
                 break
 
 # Multi-select for genes to visualize
-all_unique_genes = sorted(filtered_df['Gene'].unique().tolist())
+all_unique_genes = sorted(filtered_store.genes.tolist())
 selected_genes = st.sidebar.multiselect(
     "Select Genes to Visualize:",
     options=all_unique_genes,
@@ -236,6 +209,13 @@ selected_genes = st.sidebar.multiselect(
     help="Choose one or more genes to display their expression patterns (Log2 Scale)."
 )
 
+# Box plot style
+selected_style = st.sidebar.selectbox(
+    "Plot Style:",
+    list(STYLES),
+    help="Box plots with or without the individual sample points."
+)
+
 st.sidebar.write("---")
 st.sidebar.info("""
 **Data simulated for demonstration purposes.**
@@ -251,12 +231,17 @@ if not selected_genes:
 else:
     st.subheader(f"Expression of Selected Genes in {selected_cancer_type} Samples")
 
-    # Filter data for selected genes
-    plot_df = filtered_df[filtered_df['Gene'].isin(selected_genes)]
-
-    if plot_df.empty:
+    if filtered_store.matrix.shape[1] == 0:
         st.warning(f"No data available for the selected genes in {selected_cancer_type} (or 'All Cancer Types'). Please try different selections.")
     else:
+        # Render all selected genes in one batch (cached per gene, cancer type and style; stats from the cube)
+        with stage("render_boxplots"):
+            gene_images = render_gene_boxplots(filtered_store, selected_genes, selected_cancer_type,
+                                               STYLES[selected_style], box_stats=cube.box_statistics(cancer_filter))
+        cache_stats = shared_figure_cache().stats()
+        st.caption(f"Figure cache: {cache_stats['hits'] + cache_stats['disk_hits']} hits, "
+                   f"{cache_stats['misses']} misses")
+
         # Arrange plots in columns if many genes selected
         num_genes = len(selected_genes)
         num_cols = 2 if num_genes > 1 else 1
@@ -265,25 +250,16 @@ else:
         for i, gene in enumerate(selected_genes):
             with cols[i % num_cols]:
                 st.markdown(f"#### {gene}")
-                gene_df = plot_df[plot_df['Gene'] == gene].copy() # Use .copy() to avoid SettingWithCopyWarning
-
-                # Create box plot
-                fig, ax = plt.subplots(figsize=(7, 4)) # Adjust figsize for columns
-                sns.boxplot(data=gene_df, x='Sample_Type', y='Log2_Expression',
-                            palette={'Tumor': 'salmon', 'Normal': 'lightskyblue'}, ax=ax,
-                            showfliers=False) # Hide outliers for cleaner look
-                sns.stripplot(data=gene_df, x='Sample_Type', y='Log2_Expression',
-                              color='black', size=4, jitter=0.2, ax=ax, alpha=0.6) # Add individual data points
-                ax.set_title(f'Expression of {gene}', fontsize=12)
-                ax.set_xlabel('Sample Type', fontsize=10)
-                ax.set_ylabel('Log2 Expression Value', fontsize=10)
-                plt.xticks(fontsize=10)
-                plt.yticks(fontsize=10)
-                st.pyplot(fig)
-                plt.close(fig) # Close the figure to free up memory
+                st.image(gene_images[gene]) # Pre-rendered box plot (PNG)
 
                 st.markdown("---") # Separator between gene plots
 
+# --- Differential Expression Results ---
+with st.expander(f"Differential Expression Results ({selected_test}, {selected_cancer_type})"):
+    st.dataframe(de_results)
+    st.download_button("Download results (CSV)", de_results.to_csv(index=False).encode(),
+                       file_name="differential_expression.csv", mime="text/csv")
+
 # --- Footer / About Section ---
 st.markdown("### About this Dashboard")
 st.info("""
@@ -303,3 +279,7 @@ st.markdown("---")
 st.markdown("Created by Nana Safo Duker")
 st.markdown("[GitHub Repository Link Placeholder](YOUR_GITHUB_REPO_LINK_HERE)") # Remember to update this!
 st.markdown("Feel free to connect on [LinkedIn Profile Link Placeholder](YOUR_LINKEDIN_PROFILE_LINK_HERE)") # Remember to update this!
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
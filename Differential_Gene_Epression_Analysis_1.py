@@ -2,9 +2,14 @@ import streamlit as st
 import pandas as pd
 import altair as alt
 
+from perf import performance_panel, stage, start_run
+
 # Page configuration
 st.set_page_config(page_title="Gene Expression Dashboard", layout="wide")
 
+show_performance = st.sidebar.checkbox("Show performance panel")
+start_run("Differential_Gene_Epression_Analysis_1", trace_memory=show_performance)
+
 # Title and instructions
 st.title("🧬 Gene Expression Dashboard")
 st.markdown("""
@@ -19,7 +24,8 @@ uploaded_file = st.file_uploader("Upload CSV", type="csv")
 # Main logic
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
+        with stage("read_csv"):
+            df = pd.read_csv(uploaded_file)
 
         
         # Check if there are at least 2 columns
@@ -52,9 +58,14 @@ if uploaded_file:
                 height=400
             )
 
-            st.altair_chart(chart, use_container_width=True)
+            with stage("altair_chart"):
+                st.altair_chart(chart, use_container_width=True)
 
     except Exception as e:
         st.error(f"An error occurred while processing the file: {e}")
 else:
     st.info("Please upload a gene expression CSV file to begin.")
+
+# Per-stage timings of this run
+if show_performance:
+    performance_panel()
@@ -0,0 +1,132 @@
+"""
+Per-(cancer type, gene, sample type) summary cube of an ExpressionStore, built once at load.
+
+Every cancer type selection of the Analysis5 dashboard, "All" included, is answered from
+the cube instead of rescanning the expression matrix: group means, variances and Welch
+t-tests come from per-block counts, sums and sums of squared deviations, which combine
+exactly across cancer types; box plot statistics are stored per block and, since
+quantiles do not combine, for the all-cancer-types margin as well.
+"""
+
+import numpy as np
+
+from boxplots import SAMPLE_TYPE_ORDER, box_statistics
+from de_engine import results_frame, welch_from_moments
+
+BOX_STATISTICS = ("q1", "med", "q3", "whislo", "whishi")
+
+
+class AggregateCube:
+    """
+    Summary arrays of shape (cancer types, genes, sample types); see the module docstring.
+
+    `count`, `total` and `m2` hold the number of measurements, their sum and their sum of
+    squared deviations from the block mean (NaN ignored). `box` maps each of
+    BOX_STATISTICS to an array with one extra leading row, the statistics over all
+    cancer types.
+    """
+
+    def __init__(self, genes, cancer_types, sample_types, count, total, m2, box):
+        self.genes = genes
+        self.cancer_types = list(cancer_types)
+        self.sample_types = list(sample_types)
+        self.count = count
+        self.total = total
+        self.m2 = m2
+        self.box = box
+        self._cancer_index = {cancer: i for i, cancer in enumerate(self.cancer_types)}
+
+    @classmethod
+    def from_store(cls, store):
+        """One pass over the store's contiguous (cancer type, sample type) column blocks."""
+        present = set(store.samples["Sample_Type"].astype(str))
+        sample_types = [t for t in SAMPLE_TYPE_ORDER if t in present] + sorted(present - set(SAMPLE_TYPE_ORDER))
+        cancer_types = store.cancer_types
+        shape = (len(cancer_types), len(store.genes), len(sample_types))
+        count = np.zeros(shape, dtype=np.int64)
+        total = np.zeros(shape)
+        m2 = np.zeros(shape)
+        box = {name: np.full((shape[0] + 1,) + shape[1:], np.nan) for name in BOX_STATISTICS}
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for (cancer, sample_type), columns in store.block_slices.items():
+                c, s = cancer_types.index(cancer), sample_types.index(str(sample_type))
+                block = np.asarray(store.matrix[:, columns], dtype=np.float64)
+                n = np.count_nonzero(~np.isnan(block), axis=1)
+                block_total = np.nansum(block, axis=1)
+                mean = np.where(n > 0, block_total / n, 0.0)
+                count[c, :, s], total[c, :, s] = n, block_total
+                m2[c, :, s] = np.nansum((block - mean[:, None]) ** 2, axis=1)
+                stats = box_statistics(block)
+                for name in BOX_STATISTICS:
+                    box[name][c + 1, :, s] = stats[name]
+
+        # Quantiles of all cancer types together cannot be combined from the blocks
+        all_types = store.samples["Sample_Type"].astype(str).to_numpy()
+        for s, sample_type in enumerate(sample_types):
+            stats = box_statistics(store.matrix[:, all_types == sample_type])
+            for name in BOX_STATISTICS:
+                box[name][0, :, s] = stats[name]
+        return cls(store.genes, cancer_types, sample_types, count, total, m2, box)
+
+    @property
+    def nbytes(self):
+        return (self.count.nbytes + self.total.nbytes + self.m2.nbytes
+                + sum(values.nbytes for values in self.box.values()))
+
+    def _cancer_rows(self, cancer_type):
+        # Cube rows of one cancer type (an empty slice for an unknown one), or all of them
+        if cancer_type is None:
+            return slice(None)
+        i = self._cancer_index.get(cancer_type)
+        return slice(0, 0) if i is None else slice(i, i + 1)
+
+    def moments(self, cancer_type=None):
+        """
+        (count, mean, variance) per gene x sample type for one cancer type, or all (None).
+
+        Blocks are merged with the pairwise update for M2 (sum of squared deviations),
+        M2 = sum(M2_k) + sum(n_k * (mean_k - mean)^2), which is exact and stable.
+        """
+        rows = self._cancer_rows(cancer_type)
+        count, total, m2 = self.count[rows], self.total[rows], self.m2[rows]
+        n = count.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total.sum(axis=0) / n
+            block_mean = np.where(count > 0, total / np.maximum(count, 1), mean)
+            combined_m2 = m2.sum(axis=0) + (count * (block_mean - mean) ** 2).sum(axis=0)
+            var = combined_m2 / (n - 1)
+        return n, mean, var
+
+    def differential_expression(self, cancer_type=None, case="Tumor", control="Normal"):
+        """Welch t-test of every gene, `case` vs `control`, as de_engine.differential_expression_matrix returns it."""
+        n, mean, var = self.moments(cancer_type)
+
+        def group(sample_type):
+            # A sample type absent from the data is an empty group, as in the matrix path
+            if sample_type not in self.sample_types:
+                missing = np.full(len(self.genes), np.nan)
+                return np.zeros(len(self.genes), dtype=np.int64), missing, missing
+            s = self.sample_types.index(sample_type)
+            return n[:, s], mean[:, s], var[:, s]
+
+        n_a, mean_a, var_a = group(case)
+        n_b, mean_b, var_b = group(control)
+        statistic, pvalue = welch_from_moments(n_a, mean_a, var_a, n_b, mean_b, var_b)
+        return results_frame(self.genes, n_a, mean_a, n_b, mean_b, statistic, pvalue)
+
+    def box_statistics(self, cancer_type=None):
+        """
+        {sample type: box_statistics-style dict of per-gene arrays} for one cancer type, or all (None).
+
+        Sample types without measurements in that selection are left out.
+        """
+        if cancer_type is None:
+            row = 0
+        elif cancer_type in self._cancer_index:
+            row = self._cancer_index[cancer_type] + 1
+        else:
+            return {}
+        n = self.count[self._cancer_rows(cancer_type)].sum(axis=0)
+        return {sample_type: dict({name: self.box[name][row, :, s] for name in BOX_STATISTICS}, n=n[:, s])
+                for s, sample_type in enumerate(self.sample_types) if n[:, s].any()}
@@ -0,0 +1,193 @@
+"""Incremental loading of a local results CSV that a running pipeline keeps appending to."""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from de_pipeline import REQUIRED_COLUMNS
+from ingest import CATEGORY_COLUMNS, file_format, read_de_table, resolve_columns
+from perf import stage
+from threshold_index import ThresholdIndex
+from transforms import DEFAULT_PADJ_FLOOR, neg_log10_padj, padj_floor
+
+# Bytes read per refresh at most, so a huge backlog is caught up over several refreshes
+MAX_READ_BYTES = 256 * 1024 ** 2
+
+# Only files under this directory can be watched (override with DGE_WATCH_ROOT)
+WATCH_ROOT = os.path.realpath(os.environ.get("DGE_WATCH_ROOT", os.getcwd()))
+
+# Watched files kept loaded at most; the least recently refreshed one is dropped first
+MAX_WATCHED = int(os.environ.get("DGE_MAX_WATCHED", "8"))
+
+
+class AppendingResults:
+    """
+    A results CSV on disk that only grows, loaded incrementally.
+
+    The byte offset after the last complete line is remembered; refresh() parses only the
+    rows appended since (a trailing partial line waits for the next refresh), appends them
+    to the typed frame, extends the derived `-log10(padj)` column and the regulation counts,
+    and merges them into the ThresholdIndex (see ThresholdIndex.append). If the file
+    shrinks or its header changes, it is treated as a new file and reloaded from scratch.
+    Plain (uncompressed) CSV only; quoted fields must not contain line breaks.
+    """
+
+    def __init__(self, path, padj_floor=DEFAULT_PADJ_FLOOR):
+        if file_format(path) != ("csv", None):
+            raise ValueError("Only plain CSV files can be watched for appended rows")
+        self.path = os.fspath(path)
+        self.padj_floor = padj_floor
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.header = None
+        self.column_map = None
+        self.offset = 0
+        self.frame = None
+        self.index = None
+        self.regulation_counts = {}
+        self.last_appended = 0
+        self._min_positive = np.inf
+        self._zero_rows = np.empty(0, dtype=np.int64)
+
+    def _read_header(self, handle):
+        header = handle.readline()
+        if not header.endswith(b"\n"):
+            return None  # header not completely written yet
+        return header
+
+    def _floor_value(self):
+        if self.padj_floor == "min_positive" and np.isfinite(self._min_positive):
+            return self._min_positive
+        return padj_floor(np.empty(0), self.padj_floor)
+
+    def _append(self, new):
+        padj = new["padj"].to_numpy(dtype=np.float64, na_value=np.nan)
+        log2fc = new["log2FoldChange"].to_numpy(dtype=np.float32, na_value=np.nan)
+        n_old = 0 if self.frame is None else len(self.frame)
+
+        # -log10(padj) of the new rows; zeros follow the floor, which may move as rows arrive
+        positive = padj[padj > 0]
+        if positive.size:
+            self._min_positive = min(self._min_positive, float(positive.min()))
+        self._zero_rows = np.concatenate([self._zero_rows, n_old + np.flatnonzero(padj == 0)])
+        new_neg = neg_log10_padj(padj, floor=None)
+        if n_old:
+            neg = np.concatenate([self.frame["-log10(padj)"].to_numpy(dtype=np.float64), new_neg])
+        else:
+            neg = new_neg
+        if self.padj_floor is not None and self._zero_rows.size:
+            neg[self._zero_rows] = -np.log10(self._floor_value())
+
+        if "regulation" in new.columns:
+            for value, count in new["regulation"].value_counts().items():
+                self.regulation_counts[value] = self.regulation_counts.get(value, 0) + int(count)
+
+        if n_old:
+            # Keep categorical columns categorical across appends
+            categories = {name: union_categoricals([self.frame[name], new[name]], ignore_order=True)
+                          for name in CATEGORY_COLUMNS
+                          if name in new.columns and isinstance(new[name].dtype, pd.CategoricalDtype)
+                          and isinstance(self.frame[name].dtype, pd.CategoricalDtype)}
+            frame = pd.concat([self.frame.drop(columns="-log10(padj)"), new], ignore_index=True)
+            for name, values in categories.items():
+                frame[name] = values
+            index = self.index.append(padj, log2fc)
+        else:
+            frame = new
+            index = ThresholdIndex(padj, log2fc)
+        frame["-log10(padj)"] = neg
+        self.frame, self.index = frame, index
+
+    def refresh(self):
+        """
+        Parses rows appended since the last call and returns the number of new rows.
+
+        The frame, index and counts are replaced, never modified in place, so a frame
+        obtained earlier from snapshot() stays valid while another session refreshes.
+        """
+        with self._lock, stage("append_rows") as info:
+            try:
+                size = os.path.getsize(self.path)
+            except OSError:
+                raise FileNotFoundError(f"Cannot read {self.path}") from None
+            with open(self.path, "rb") as handle:
+                header = self._read_header(handle)
+                if header is None:
+                    self.last_appended = 0
+                    info["rows"] = 0
+                    return 0
+                if self.header is not None and (header != self.header or size < self.offset):
+                    # Truncated or replaced: start over
+                    self._reset()
+                if self.header is None:
+                    self.header = header
+                    self.column_map = resolve_columns(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+                    missing = REQUIRED_COLUMNS - set(self.column_map.values())
+                    if missing:
+                        raise ValueError(f"Missing required columns: {sorted(missing)}")
+                    self.offset = len(header)
+
+                handle.seek(self.offset)
+                data = handle.read(MAX_READ_BYTES)
+            # Only complete lines; a partially written last row is picked up next time
+            end = data.rfind(b"\n") + 1
+            if end == 0:
+                self.last_appended = 0
+                info["rows"] = 0
+                return 0
+            new = read_de_table(io.BytesIO(self.header + data[:end]), self.column_map)
+            self.offset += end
+            if len(new):
+                self._append(new)
+            self.last_appended = len(new)
+            info["rows"] = len(new)
+            return len(new)
+
+    def snapshot(self):
+        """(frame, ThresholdIndex, regulation counts) as of the last refresh; frame is None before any rows."""
+        with self._lock:
+            frame = None if self.frame is None else self.frame.copy(deep=False)
+            return frame, self.index, dict(self.regulation_counts)
+
+
+_watched = OrderedDict()
+_watched_lock = threading.Lock()
+
+
+def watch_path(path, root=None):
+    """
+    Resolved absolute path of `path`, which must lie under `root` (default WATCH_ROOT).
+
+    Relative paths are taken relative to the root. Raises ValueError for anything
+    outside it, symbolic links included.
+    """
+    root = WATCH_ROOT if root is None else os.path.realpath(root)
+    resolved = os.path.realpath(os.path.join(root, os.fspath(path)))
+    if os.path.commonpath([root, resolved]) != root:
+        raise ValueError(f"Only files under {root} can be watched")
+    return resolved
+
+
+def watched_results(path, padj_floor=DEFAULT_PADJ_FLOOR):
+    """
+    The process-wide AppendingResults for `path`, so sessions watching one file share its rows.
+
+    `path` must lie under WATCH_ROOT (see watch_path). At most MAX_WATCHED files stay
+    loaded; a session still watching an evicted file reloads it on its next refresh.
+    """
+    key = (watch_path(path), repr(padj_floor))
+    with _watched_lock:
+        results = _watched.get(key)
+        if results is None:
+            results = _watched[key] = AppendingResults(key[0], padj_floor=padj_floor)
+        _watched.move_to_end(key)
+        while len(_watched) > MAX_WATCHED:
+            _watched.popitem(last=False)
+        return results
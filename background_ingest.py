@@ -0,0 +1,275 @@
+"""
+Background parsing of large result uploads, so a dashboard can paint before the whole file is read.
+
+A BackgroundLoad parses a results file on a worker thread, chunk by chunk, into the same
+typed frame load_dataset would build. Until it finishes, snapshot() returns the rows
+parsed so far (with their -log10(padj)), which the dashboards render as a provisional
+view and refresh as more chunks land. The finished frame is stored in the shared dataset
+cache, so the rerun after completion is a plain load_dataset cache hit.
+
+progressive_dataset() serves sessions from the process-wide dataset registry, and
+sessions uploading the same file while it is being parsed wait on the same load.
+"""
+
+import io
+import os
+import threading
+import time
+
+from dataset_cache import dataset_key, shared_cache
+from dataset_registry import session_holder, shared_registry
+from ingest import (DEFAULT_CHUNKSIZE, combine_chunks, file_format, iter_csv_chunks, mark_needs_coercion,
+                    needs_coercion, read_de_table)
+from transforms import DEFAULT_PADJ_FLOOR, neg_log10_padj
+
+# Rows in the first chunk, which the provisional view is drawn from
+FIRST_CHUNK_ROWS = 20_000
+
+# How long a rerun waits for the first chunk before rendering without it
+FIRST_CHUNK_WAIT_SECONDS = 2.0
+
+# Delay between reruns while a load is running
+POLL_SECONDS = 0.5
+
+
+def _private_source(file):
+    # The worker reads its own handle, so the script thread can keep seeking the upload
+    if isinstance(file, (str, os.PathLike)):
+        return file
+    source = io.BytesIO(file.getvalue()) if hasattr(file, "getvalue") else io.BytesIO(file.read())
+    source.name = getattr(file, "name", None) or ""
+    return source
+
+
+class BackgroundLoad:
+    """
+    Parses one results file on a daemon thread; see the module docstring.
+
+    `progress` is the fraction of the file read, `error` the exception that stopped the
+    load (if any), and `done` is set once it finished, failed or was cancelled.
+    """
+
+    def __init__(self, file, column_map, key, cache=None, padj_floor=DEFAULT_PADJ_FLOOR,
+                 chunksize=DEFAULT_CHUNKSIZE, first_rows=FIRST_CHUNK_ROWS):
+        self.key = key
+        self.column_map = dict(column_map)
+        self.padj_floor = padj_floor
+        self.progress = 0.0
+        self.error = None
+        self.frame = None
+        self._cache = shared_cache() if cache is None else cache
+        self._source = _private_source(file)
+        self._chunksize = chunksize
+        self._first_rows = first_rows
+        self._chunks = []
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._first_chunk = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="background-ingest", daemon=True)
+        self._thread.start()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Stops the worker after its current chunk; nothing is cached."""
+        self._cancelled.set()
+
+    def wait(self, timeout=None):
+        """Waits until the load is done; returns whether it is."""
+        return self._done.wait(timeout)
+
+    def wait_first_chunk(self, timeout=None):
+        """Waits until a first chunk (or the end of the load) is available."""
+        return self._first_chunk.wait(timeout)
+
+    def _parse_csv(self, coerce):
+        source = self._source
+        if isinstance(source, (str, os.PathLike)):
+            source = open(source, "rb")
+        try:
+            size = source.seek(0, os.SEEK_END)
+            source.seek(0)
+            _, compression = file_format(self._source)
+            for chunk in iter_csv_chunks(source, self.column_map, self._chunksize, coerce, compression,
+                                         first_rows=self._first_rows):
+                if self._cancelled.is_set():
+                    return
+                with self._lock:
+                    self._chunks.append(chunk)
+                    self.progress = min(source.tell() / (size or 1), 1.0)
+                self._first_chunk.set()
+        finally:
+            if source is not self._source:
+                source.close()
+
+    def _run(self):
+        try:
+            if file_format(self._source)[0] != "csv":
+                # Columnar files are read whole; they need no text parsing to speed through
+                with self._lock:
+                    self._chunks = [read_de_table(self._source, self.column_map)]
+            else:
+                try:
+                    self._parse_csv(needs_coercion(self.column_map))
+                except ValueError:
+                    if needs_coercion(self.column_map):
+                        raise
+                    # A stats column holds non-numeric values; start over, coercing them
+                    mark_needs_coercion(self.column_map)
+                    with self._lock:
+                        self._chunks = []
+                    self._parse_csv(True)
+            if self._cancelled.is_set():
+                return
+            df = self.snapshot()
+            self._cache.put(self.key, df)
+            with self._lock:
+                self.frame = df
+                self.progress = 1.0
+        except Exception as e:
+            self.error = e
+        finally:
+            self._first_chunk.set()
+            self._done.set()
+            _forget_load(self)
+
+    def snapshot(self):
+        """Typed frame (with -log10(padj)) of the rows parsed so far, or None before the first chunk."""
+        with self._lock:
+            if self.frame is not None:
+                return self.frame.copy(deep=False)
+            chunks = list(self._chunks)
+        if not chunks:
+            return None
+        df = combine_chunks(chunks, self.column_map.values())
+        df["-log10(padj)"] = neg_log10_padj(df["padj"], floor=self.padj_floor)
+        return df
+
+
+_loads = {}  # dataset key -> (running BackgroundLoad, holders waiting on it)
+_loads_lock = threading.Lock()
+
+
+def _join_load(file, column_map, key, cache, padj_floor, holder):
+    # The running load of `key`, started if no session is parsing that dataset yet
+    with _loads_lock:
+        entry = _loads.get(key)
+        if entry is None or entry[0].cancelled:
+            entry = _loads[key] = (BackgroundLoad(file, column_map, key, cache, padj_floor), set())
+        entry[1].add(holder)
+        return entry[0]
+
+
+def _leave_load(load, holder):
+    # Stops waiting on `load`; the parse itself is cancelled once no session waits on it
+    with _loads_lock:
+        entry = _loads.get(load.key)
+        if entry is not None and entry[0] is load:
+            entry[1].discard(holder)
+            if entry[1]:
+                return
+            del _loads[load.key]
+    load.cancel()
+
+
+def _forget_load(load):
+    # Finished loads are served from the registry and dataset cache, not shared further
+    with _loads_lock:
+        entry = _loads.get(load.key)
+        if entry is not None and entry[0] is load:
+            del _loads[load.key]
+
+
+def cancel_background_load(session_key="upload"):
+    """Cancels the session's running load and releases its dataset (e.g. once the upload is removed)."""
+    import streamlit as st
+
+    holder = session_holder(session_key)
+    st.session_state.pop(f"{session_key}_load_cancelled", None)
+    load = st.session_state.pop(f"{session_key}_background_load", None)
+    if load is not None:
+        _leave_load(load, holder)
+    shared_registry().release(holder)
+
+
+def progressive_dataset(file, column_map, session_key="upload", padj_floor=DEFAULT_PADJ_FLOOR):
+    """
+    Streamlit helper: the dataset of `file` as far as it is parsed, and the load still running.
+
+    Returns (df, None) once the file is fully loaded; the frame is a shallow copy of the
+    registry's shared, read-only one (add columns to it, but do not write into existing
+    ones). Otherwise returns (rows parsed so far, BackgroundLoad) after showing a progress
+    bar with a Cancel button; call rerun_while_loading() at the end of the script to
+    refresh the view as chunks land. Starting a load for a different file (or column
+    mapping) leaves the session's previous one, which stops unless another session still
+    waits on it.
+    """
+    import streamlit as st
+
+    cache = shared_cache()
+    registry = shared_registry()
+    holder = session_holder(session_key)
+    key = dataset_key(file, column_map, padj_floor, cache)
+    state_key = f"{session_key}_background_load"
+    cancelled_key = f"{session_key}_load_cancelled"
+    load = st.session_state.get(state_key)
+
+    df = registry.acquire(key, holder)
+    if df is not None:
+        if load is not None:
+            _leave_load(load, holder)
+            del st.session_state[state_key]
+        st.session_state.pop(cancelled_key, None)
+        return df.copy(deep=False), None
+
+    if load is not None and load.key != key:
+        _leave_load(load, holder)
+        load = None
+    if load is None and st.session_state.get(cancelled_key) == key:
+        st.warning("Loading was cancelled.")
+        if not st.button("Load again", key=f"{session_key}_load_again"):
+            st.stop()
+    st.session_state.pop(cancelled_key, None)
+    if load is None or load.cancelled:
+        load = st.session_state[state_key] = _join_load(file, column_map, key, cache, padj_floor, holder)
+
+    load.wait_first_chunk(FIRST_CHUNK_WAIT_SECONDS)
+    if load.done and load.error is not None:
+        del st.session_state[state_key]
+        raise load.error
+    if load.done and not load.cancelled:
+        del st.session_state[state_key]
+        df = registry.acquire(key, holder, load=lambda: load.frame)
+        return df.copy(deep=False), None
+    df = load.snapshot()
+
+    progress_col, cancel_col = st.columns([5, 1])
+    with progress_col:
+        rows = 0 if df is None else len(df)
+        st.progress(load.progress, text=f"Parsing file in the background... {load.progress:.0%} "
+                                        f"({rows:,} rows so far; the view below is provisional)")
+    with cancel_col:
+        if st.button("Cancel", key=f"{session_key}_cancel_load"):
+            _leave_load(load, holder)
+            del st.session_state[state_key]
+            st.session_state[cancelled_key] = key
+            st.rerun()
+    if df is None:
+        rerun_while_loading(load)
+    return df, load
+
+
+def rerun_while_loading(load):
+    """Reruns the script after a short delay while `load` is still parsing (no-op otherwise)."""
+    import streamlit as st
+
+    if load is not None and not load.done:
+        time.sleep(POLL_SECONDS)
+        st.rerun()
@@ -0,0 +1,121 @@
+"""
+Headless batch run of the volcano/significance pipeline over many result files.
+
+Examples:
+    python batch_volcano.py results/ --out significant/
+    python batch_volcano.py "study1/*_vs_normal.csv.gz" --logfc 1.5 --padj 0.01 --workers 8
+
+Each input file is processed in its own worker process. For every file a
+<name>_significant.csv table (sorted by padj) is written to --out, plus a
+summary.csv with one row per file.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from de_pipeline import prepare_results, significant_genes
+from ingest import UPLOAD_TYPES
+
+RESULT_SUFFIXES = tuple(f".{ext}" for ext in UPLOAD_TYPES)
+SUMMARY_COLUMNS = ["file", "status", "genes", "significant", "up", "down", "min_padj",
+                   "seconds", "output", "error"]
+COUNT_COLUMNS = ["genes", "significant", "up", "down"]
+
+
+def find_result_files(patterns):
+    """Expands directories (all supported result files inside) and glob patterns, sorted."""
+    files = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            names = sorted(os.listdir(pattern))
+            files.extend(os.path.join(pattern, name) for name in names
+                         if name.lower().endswith(RESULT_SUFFIXES))
+        else:
+            files.extend(sorted(glob.glob(pattern, recursive=True)))
+    return list(dict.fromkeys(files))
+
+
+def output_name(path, taken):
+    # Strip every known extension (e.g. .csv.gz) and keep names unique within the run
+    name = os.path.basename(path)
+    while name.lower().endswith(RESULT_SUFFIXES):
+        name = os.path.splitext(name)[0]
+    candidate, i = name, 2
+    while candidate in taken:
+        candidate, i = f"{name}_{i}", i + 1
+    taken.add(candidate)
+    return f"{candidate}_significant.csv"
+
+
+def process_file(path, out_path, logfc_threshold, padj_threshold):
+    """Runs the pipeline on one file, writes its significant-gene table and returns a summary row."""
+    start = time.perf_counter()
+    summary = {"file": path, "output": out_path}
+    try:
+        df = prepare_results(path)
+        significant = significant_genes(df, logfc_threshold, padj_threshold)
+        significant.to_csv(out_path, index=False)
+        log2fc = significant["log2FoldChange"].to_numpy(dtype=np.float64, na_value=np.nan)
+        summary.update({
+            "genes": len(df),
+            "significant": len(significant),
+            "up": int((log2fc > 0).sum()),
+            "down": int((log2fc < 0).sum()),
+            "min_padj": float(significant["padj"].min()) if len(significant) else np.nan,
+            "status": "ok",
+            "error": "",
+        })
+    except Exception as e:
+        summary.update({"status": "error", "error": str(e)})
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="result files, directories or glob patterns")
+    parser.add_argument("--out", default="significant_genes", help="output directory")
+    parser.add_argument("--logfc", type=float, default=1.0, help="|log2 fold change| threshold")
+    parser.add_argument("--padj", type=float, default=0.05, help="adjusted p-value threshold")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    args = parser.parse_args(argv)
+
+    files = find_result_files(args.inputs)
+    if not files:
+        parser.error("no result files found")
+    os.makedirs(args.out, exist_ok=True)
+
+    taken = set()
+    jobs = [(path, os.path.join(args.out, output_name(path, taken))) for path in files]
+    summaries = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(process_file, path, out_path, args.logfc, args.padj)
+                   for path, out_path in jobs]
+        for done, future in enumerate(as_completed(futures), 1):
+            summary = future.result()
+            summaries.append(summary)
+            detail = (f"{summary['significant']} significant" if summary["status"] == "ok"
+                      else summary["error"])
+            print(f"[{done}/{len(jobs)}] {summary['file']}: {detail}", file=sys.stderr)
+
+    summary_df = pd.DataFrame(summaries, columns=SUMMARY_COLUMNS)
+    summary_df[COUNT_COLUMNS] = summary_df[COUNT_COLUMNS].astype("Int64")
+    summary_df = summary_df.sort_values("file").reset_index(drop=True)
+    summary_df.to_csv(os.path.join(args.out, "summary.csv"), index=False)
+    n_failed = int((summary_df["status"] != "ok").sum())
+    print(f"Processed {len(jobs)} files in {time.perf_counter() - start:.1f}s "
+          f"({n_failed} failed); summary written to {os.path.join(args.out, 'summary.csv')}",
+          file=sys.stderr)
+    return 1 if n_failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
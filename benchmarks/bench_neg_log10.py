@@ -0,0 +1,46 @@
+"""
+Micro-benchmark: vectorized -log10(padj) vs the per-row `apply` the dashboards used.
+
+Run from the repository root:
+    python -m benchmarks.bench_neg_log10
+"""
+
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from transforms import neg_log10_padj
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def apply_version(padj):
+    return padj.apply(lambda x: -np.log10(x) if x > 0 else np.nan)
+
+
+def make_padj(n, seed=0):
+    # Realistic shape: mostly large p-values, a long tail of tiny ones, some zeros and NaNs
+    rng = np.random.default_rng(seed)
+    padj = rng.random(n) ** 4
+    padj[rng.random(n) < 0.001] = 0.0
+    padj[rng.random(n) < 0.05] = np.nan
+    return pd.Series(padj)
+
+
+def best_of(func, arg, repeat):
+    return min(timeit.repeat(lambda: func(arg), number=1, repeat=repeat))
+
+
+def main():
+    print(f"{'rows':>10} {'apply (s)':>12} {'vectorized (s)':>16} {'speedup':>9}")
+    for n in SIZES:
+        padj = make_padj(n)
+        repeat = 3 if n >= 1_000_000 else 5
+        t_apply = best_of(apply_version, padj, repeat)
+        t_vec = best_of(neg_log10_padj, padj, repeat)
+        print(f"{n:>10,} {t_apply:>12.4f} {t_vec:>16.5f} {t_apply / t_vec:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+"""
+Headless benchmark suite for the dashboard pipeline (no Streamlit server needed).
+
+Times CSV parsing, column standardization, the -log10(padj) transform, the
+significance mask with sorting, volcano spec serialization and the mock expression
+cohorts behind Analysis5 (store and aggregate cube builds, DE tests) at several sizes,
+and writes the best-of-N timings to JSON. The cache_hit benchmarks compare an
+st.cache_data hit keyed on a DataFrame argument with one keyed on a DatasetHandle.
+
+Run from the repository root:
+    python -m benchmarks.run_benchmarks --out baseline.json
+    python -m benchmarks.run_benchmarks --compare baseline.json      # flags regressions
+    python -m benchmarks.run_benchmarks --quick --filter volcano
+
+Baselines are machine-specific; compare runs made on the same host. --compare exits
+with status 1 if any benchmark is slower than the baseline by more than --threshold.
+
+--memory profiles peak memory (tracemalloc) while parsing a 1M-row table and while
+rendering one filtered view of it, and exits with status 1 if either peak exceeds a fixed
+multiple of the parsed frame's size:
+    python -m benchmarks.run_benchmarks --memory
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from aggregate_cube import AggregateCube
+from dataset_handle import HASH_FUNCS, DatasetHandle
+from de_engine import differential_expression_matrix
+from de_pipeline import regulation_mask, significant_genes
+from expression_store import ExpressionStore
+from ingest import read_de_table, standardize_columns
+from mock_data import generate_mock_cohort
+from threshold_index import ThresholdIndex
+from transforms import neg_log10_padj
+from volcano import volcano_chart
+
+DE_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+# (genes, patients); each patient contributes a Tumor and a Normal sample
+MATRIX_SIZES = [(100, 25), (2_000, 100), (20_000, 250)]
+QUICK_DE_SIZES = DE_SIZES[:3]
+QUICK_MATRIX_SIZES = MATRIX_SIZES[:2]
+
+DE_BENCHMARKS = ["csv_parse", "pd_read_csv_full", "standardize_columns", "neg_log10_padj",
+                 "significance_mask_sort", "threshold_index_build", "threshold_index_query", "volcano_spec"]
+CACHE_BENCHMARKS = ["cache_hit_frame", "cache_hit_handle"]
+MATRIX_BENCHMARKS = ["load_mock_data", "expression_store_build", "aggregate_cube_build", "de_welch",
+                     "de_welch_cube", "de_mannwhitney"]
+
+DEFAULT_THRESHOLD = 1.25
+LOGFC_THRESHOLD = 1.0
+PADJ_THRESHOLD = 0.05
+
+MEMORY_PROFILE_ROWS = 1_000_000
+# Peak traced allocations allowed, as multiples of the parsed frame's memory usage
+MAX_PARSE_PEAK_RATIO = 1.5
+MAX_VIEW_PEAK_RATIO = 1.3
+
+# Raw headers as they appear in uploaded result files (resolved by standardize_columns)
+RAW_COLUMNS = {"Gene": "gene_name", "log2FoldChange": "log2 Fold Change", "padj": "pAdj",
+               "regulation": "Regulation"}
+
+
+def make_de_table(n, seed=0):
+    """Synthetic DESeq2-like result table with raw (non-standard) column names."""
+    rng = np.random.default_rng(seed)
+    log2fc = rng.normal(0, 1.5, n).astype(np.float32)
+    padj = rng.random(n) ** 4
+    padj[rng.random(n) < 0.001] = 0.0
+    padj[rng.random(n) < 0.05] = np.nan
+    regulation = np.where(log2fc > 0, "Up", "Down")
+    return pd.DataFrame({
+        RAW_COLUMNS["Gene"]: [f"GENE{i}" for i in range(n)],
+        "baseMean": rng.gamma(2.0, 200.0, n),
+        RAW_COLUMNS["log2FoldChange"]: log2fc,
+        "lfcSE": rng.random(n),
+        "pvalue": padj,
+        RAW_COLUMNS["padj"]: padj,
+        RAW_COLUMNS["regulation"]: regulation,
+    })
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def _repeat_for(n):
+    return 1 if n >= 1_000_000 else 3 if n >= 100_000 else 5
+
+
+def de_benchmarks(n):
+    """Yields (name, callable, repeat) for one DE table size."""
+    raw = make_de_table(n)
+    csv_bytes = raw.to_csv(index=False).encode()
+    column_map = {raw_name: name for name, raw_name in RAW_COLUMNS.items()}
+
+    def parse():
+        return read_de_table(io.BytesIO(csv_bytes), column_map)
+
+    df = parse()
+    df["-log10(padj)"] = neg_log10_padj(df["padj"])
+    index = ThresholdIndex.from_frame(df)
+    df["Significant"] = index.mask(index.significant_positions(PADJ_THRESHOLD, LOGFC_THRESHOLD))
+
+    def volcano_spec():
+        chart = volcano_chart(df, mode="auto")
+        with alt.data_transformers.disable_max_rows():
+            return chart.to_json()
+
+    repeat = _repeat_for(n)
+    yield "csv_parse", parse, repeat
+    yield "pd_read_csv_full", lambda: pd.read_csv(io.BytesIO(csv_bytes)), repeat
+    yield "standardize_columns", lambda: standardize_columns(raw), repeat
+    yield "neg_log10_padj", lambda: neg_log10_padj(df["padj"]), repeat
+    yield "significance_mask_sort", lambda: significant_genes(df.copy(deep=False), LOGFC_THRESHOLD,
+                                                              PADJ_THRESHOLD), repeat
+    yield "threshold_index_build", lambda: ThresholdIndex.from_frame(df), repeat
+    yield "threshold_index_query", lambda: index.significant_positions(PADJ_THRESHOLD, LOGFC_THRESHOLD), 5
+    yield "volcano_spec", volcano_spec, repeat
+
+
+def cache_key_benchmarks(n):
+    """
+    Yields (name, callable, repeat) timing st.cache_data hits for one DE table size.
+
+    Both functions are primed first, so every timed call is a cache hit: its cost is
+    hashing the arguments, O(rows) for the frame and O(1) for the handle.
+    """
+    import streamlit as st
+    from streamlit.logger import set_log_level
+
+    set_log_level("error")  # bare mode: no script run context or cache runtime
+    raw = make_de_table(n)
+    csv_bytes = raw.to_csv(index=False).encode()
+    df = read_de_table(io.BytesIO(csv_bytes), {raw_name: name for name, raw_name in RAW_COLUMNS.items()})
+    # Fingerprinted once, the way uploads are (content hash of the file)
+    handle = DatasetHandle(df, hashlib.sha256(csv_bytes).hexdigest(), {"regulation": "Up"})
+
+    @st.cache_data(show_spinner=False)
+    def count_significant_frame(frame, padj_threshold):
+        return int((frame["padj"] < padj_threshold).sum())
+
+    @st.cache_data(show_spinner=False, hash_funcs=HASH_FUNCS)
+    def count_significant_handle(dataset, padj_threshold):
+        return int((dataset.source["padj"] < padj_threshold).sum())
+
+    count_significant_frame(df, PADJ_THRESHOLD)
+    count_significant_handle(handle, PADJ_THRESHOLD)
+    repeat = _repeat_for(n)
+    yield "cache_hit_frame", lambda: count_significant_frame(df, PADJ_THRESHOLD), repeat
+    yield "cache_hit_handle", lambda: count_significant_handle(handle, PADJ_THRESHOLD), 5
+
+
+def matrix_benchmarks(n_genes, n_patients):
+    """Yields (name, callable, repeat) for one mock cohort size."""
+    cohort = generate_mock_cohort(n_genes=n_genes, n_patients=n_patients, rng=42)
+    store = ExpressionStore.from_long(cohort)
+    groups = store.samples["Sample_Type"].to_numpy()
+    repeat = _repeat_for(len(cohort))
+    yield "load_mock_data", lambda: generate_mock_cohort(n_genes=n_genes, n_patients=n_patients, rng=42), repeat
+    yield "expression_store_build", lambda: ExpressionStore.from_long(cohort), repeat
+    cube = AggregateCube.from_store(store)
+    yield "aggregate_cube_build", lambda: AggregateCube.from_store(store), repeat
+    yield "de_welch", lambda: differential_expression_matrix(store.genes, groups, store.matrix, "welch"), repeat
+    yield "de_welch_cube", lambda: cube.differential_expression(), repeat
+    yield "de_mannwhitney", lambda: differential_expression_matrix(store.genes, groups, store.matrix,
+                                                                   "mannwhitney"), repeat
+
+
+def memory_profile(n=MEMORY_PROFILE_ROWS, regulation="Up"):
+    """
+    Peak traced memory of parsing an `n`-row table and of rendering one view of it.
+
+    The view is what a dashboard rerun does with the shared frame: the Significant mask
+    on a shallow copy, a regulation filter and the volcano spec. Returns
+    {"rows", "frame_bytes", "parse_peak_bytes", "view_peak_bytes", "parse_ratio",
+    "view_ratio"}, the ratios relative to the parsed frame's memory usage. Arrow-backed
+    string buffers are not traced, so the parse peak is a lower bound.
+    """
+    raw = make_de_table(n)
+    csv_bytes = raw.to_csv(index=False).encode()
+    column_map = {raw_name: name for name, raw_name in RAW_COLUMNS.items()}
+    del raw
+
+    tracemalloc.start()
+    try:
+        df = read_de_table(io.BytesIO(csv_bytes), column_map)
+        df["-log10(padj)"] = neg_log10_padj(df["padj"])
+        parse_peak = tracemalloc.get_traced_memory()[1]
+        index = ThresholdIndex.from_frame(df)
+
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        view = df.copy(deep=False)
+        significant_rows = index.significant_positions(PADJ_THRESHOLD, LOGFC_THRESHOLD)
+        view["Significant"] = index.mask(significant_rows)
+        in_regulation = regulation_mask(view, regulation)
+        significant_rows = significant_rows[in_regulation[significant_rows]]
+        chart = volcano_chart(view, mode="auto", rows=np.flatnonzero(in_regulation))
+        with alt.data_transformers.disable_max_rows():
+            chart.to_json()
+        view_peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    frame_bytes = int(df.memory_usage(deep=True).sum())
+    return {"rows": n, "frame_bytes": frame_bytes, "parse_peak_bytes": parse_peak, "view_peak_bytes": view_peak,
+            "parse_ratio": parse_peak / frame_bytes, "view_ratio": view_peak / frame_bytes}
+
+
+def run(de_sizes, matrix_sizes, name_filter=None):
+    """Runs every benchmark and returns {"meta": ..., "results": {name/size: {...}}}."""
+    results = {}
+    # Suites are generators, so skipped sizes never build their synthetic data
+    suites = [(f"{n}", DE_BENCHMARKS, lambda n=n: de_benchmarks(n), n) for n in de_sizes]
+    suites += [(f"{n}", CACHE_BENCHMARKS, lambda n=n: cache_key_benchmarks(n), n) for n in de_sizes]
+    suites += [(f"{g}x{2 * p}", MATRIX_BENCHMARKS, lambda g=g, p=p: matrix_benchmarks(g, p), g * 2 * p)
+               for g, p in matrix_sizes]
+    for size_label, names, benchmarks, rows in suites:
+        if name_filter and not any(name_filter in f"{name}/{size_label}" for name in names):
+            continue
+        for name, func, repeat in benchmarks():
+            key = f"{name}/{size_label}"
+            if name_filter and name_filter not in key:
+                continue
+            seconds = best_of(func, repeat)
+            results[key] = {"seconds": seconds, "rows": rows, "repeat": repeat}
+            print(f"{key:<40} {seconds:>10.4f} s", file=sys.stderr)
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Rows of (benchmark, baseline s, current s, ratio, status) for benchmarks in both runs.
+
+    status is "REGRESSION" when current / baseline exceeds `threshold`, "faster" when it
+    is below 1 / threshold and "ok" otherwise. Benchmarks under a millisecond are compared
+    with a 1 ms floor so timer noise does not count as a regression.
+    """
+    rows = []
+    for key, entry in current["results"].items():
+        base = baseline["results"].get(key)
+        if base is None:
+            continue
+        ratio = max(entry["seconds"], 1e-3) / max(base["seconds"], 1e-3)
+        status = "REGRESSION" if ratio > threshold else "faster" if ratio < 1 / threshold else "ok"
+        rows.append((key, base["seconds"], entry["seconds"], ratio, status))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the dashboard pipeline.")
+    parser.add_argument("--out", help="write results as JSON (e.g. a new baseline)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against a baseline JSON")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown ratio flagged as a regression (default %(default)s)")
+    parser.add_argument("--quick", action="store_true", help="skip the largest sizes")
+    parser.add_argument("--filter", help="only run benchmarks whose name/size contains this text")
+    parser.add_argument("--memory", action="store_true",
+                        help="profile peak memory on a 1M-row table instead of timing")
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        profile = memory_profile()
+        print(f"{profile['rows']:,} rows, frame {profile['frame_bytes'] / 1024 ** 2:.1f} MiB")
+        failed = False
+        for stage_name, limit in (("parse", MAX_PARSE_PEAK_RATIO), ("view", MAX_VIEW_PEAK_RATIO)):
+            ratio = profile[f"{stage_name}_ratio"]
+            status = "ok" if ratio <= limit else "OVER LIMIT"
+            failed |= ratio > limit
+            print(f"{stage_name + ' peak':<12} {profile[f'{stage_name}_peak_bytes'] / 1024 ** 2:>8.1f} MiB "
+                  f"{ratio:>5.2f}x (limit {limit:.2f}x)  {status}")
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as handle:
+                json.dump(profile, handle, indent=2)
+        return 1 if failed else 0
+
+    start = time.perf_counter()
+    current = run(QUICK_DE_SIZES if args.quick else DE_SIZES,
+                  QUICK_MATRIX_SIZES if args.quick else MATRIX_SIZES, args.filter)
+    print(f"{len(current['results'])} benchmarks in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as handle:
+            json.dump(current, handle, indent=2)
+
+    if not args.compare:
+        return 0
+    with open(args.compare, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    rows = compare(current, baseline, args.threshold)
+    print(f"{'benchmark':<40} {'baseline (s)':>13} {'current (s)':>12} {'ratio':>7}  status")
+    for key, base, now, ratio, status in rows:
+        print(f"{key:<40} {base:>13.4f} {now:>12.4f} {ratio:>6.2f}x  {status}")
+    regressions = [row for row in rows if row[4] == "REGRESSION"]
+    print(f"{len(regressions)} regression(s) above {args.threshold:.2f}x", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
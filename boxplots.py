@@ -0,0 +1,168 @@
+"""Batched tumor/normal box plots for many genes, rendered with Agg in a worker pool."""
+
+import io
+import multiprocessing
+import os
+import threading
+import warnings
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from figure_cache import figure_key, shared_figure_cache
+from perf import stage
+
+SAMPLE_TYPE_ORDER = ["Tumor", "Normal"]
+PALETTE = {"Tumor": "salmon", "Normal": "lightskyblue"}
+
+STYLES = {
+    "Box + points": "box_points",
+    "Box only": "box",
+}
+
+# Rendering is CPU-bound Python (the GIL rules out threads); one worker means in-process
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def row_quantiles(matrix, n, quantiles):
+    """
+    Linearly interpolated quantiles of every row (NaN ignored; `n` = non-NaN count per row).
+
+    Same values as np.nanpercentile(matrix, 100 * q, axis=1), from a single row-wise sort
+    instead of its per-row fallback.
+    """
+    if matrix.shape[1] == 0:
+        return [np.full(len(matrix), np.nan) for _ in quantiles]
+    ordered = np.sort(matrix, axis=1)  # NaN sorts last
+    last = np.maximum(n - 1, 0)
+    result = []
+    for q in quantiles:
+        position = q * last
+        below = np.floor(position).astype(np.intp)
+        above = np.minimum(below + 1, last)
+        low = np.take_along_axis(ordered, below[:, None], axis=1)[:, 0]
+        high = np.take_along_axis(ordered, above[:, None], axis=1)[:, 0]
+        value = low + (high - low) * (position - below)
+        value[n == 0] = np.nan
+        result.append(value)
+    return result
+
+
+def box_statistics(matrix):
+    """
+    Box plot statistics of every row of a genes x samples matrix at once (NaN ignored).
+
+    Returns a dict of per-row arrays: q1, med, q3, whislo and whishi (the most extreme
+    values within 1.5 IQR of the box, as in seaborn/matplotlib) and n.
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    n = np.count_nonzero(~np.isnan(matrix), axis=1)
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN rows
+        q1, med, q3 = row_quantiles(matrix, n, (0.25, 0.5, 0.75))
+        iqr = q3 - q1
+        low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        whislo = np.where(matrix >= low[:, None], matrix, np.inf).min(axis=1)
+        whishi = np.where(matrix <= high[:, None], matrix, -np.inf).max(axis=1)
+    whislo[n == 0] = np.nan
+    whishi[n == 0] = np.nan
+    return {"q1": q1, "med": med, "q3": q3, "whislo": whislo, "whishi": whishi, "n": n}
+
+
+def _render_png(gene, groups, style, figsize=(7, 4), dpi=100):
+    # groups: [(sample type, bxp stats dict, values)] in plotting order
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    # Fixed margins instead of bbox_inches="tight", which draws the figure twice
+    fig.subplots_adjust(left=0.11, right=0.97, bottom=0.13, top=0.91)
+    ax = fig.add_subplot()
+    boxes = ax.bxp([stats for _, stats, _ in groups], showfliers=False, patch_artist=True, widths=0.6,
+                   medianprops={"color": "black"})
+    for patch, (sample_type, _, _) in zip(boxes["boxes"], groups):
+        patch.set_facecolor(PALETTE.get(sample_type, "lightgray"))
+
+    if style == "box_points":
+        # Individual data points with a fixed per-gene jitter, so cached images are stable
+        rng = np.random.default_rng(zlib.crc32(str(gene).encode()))
+        for position, (_, _, values) in enumerate(groups, start=1):
+            jitter = rng.uniform(-0.2, 0.2, size=values.size)
+            ax.scatter(position + jitter, values, color="black", s=16, alpha=0.6, zorder=3)
+
+    ax.set_title(f"Expression of {gene}", fontsize=12)
+    ax.set_xlabel("Sample Type", fontsize=10)
+    ax.set_ylabel("Log2 Expression Value", fontsize=10)
+    ax.tick_params(labelsize=10)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def _render_pool(workers):
+    # Long-lived pool shared by all sessions; spawned workers import matplotlib once
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def render_gene_boxplots(store, genes, cancer_type, style="box_points", workers=RENDER_WORKERS, cache=None,
+                         box_stats=None):
+    """
+    PNG box/strip plots (Tumor vs Normal) for `genes` of an ExpressionStore view.
+
+    Statistics are looked up in `box_stats` ({sample type: per-gene arrays over all of
+    the store's genes}, e.g. AggregateCube.box_statistics) if given; otherwise they are
+    computed for all genes not yet cached in one pass over their matrix rows. Figures are
+    drawn on independent Agg canvases (no pyplot state), in a process pool when there are
+    several to draw and more than one CPU. Images are kept in the figure cache
+    (shared_figure_cache() by default) per (dataset, gene, cancer type, style).
+    Returns {gene: png bytes} in the order of `genes`.
+    """
+    cache = shared_figure_cache() if cache is None else cache
+    keys = {gene: figure_key("boxplot", store.digest, gene, cancer_type, style) for gene in genes}
+    images = {}
+    for gene in genes:
+        png = cache.get(keys[gene])
+        if png is not None:
+            images[gene] = png
+    missing = [gene for gene in genes if gene not in images]
+    if missing:
+        gene_rows = [store.gene_index[gene] for gene in missing]
+        rows = store.matrix[gene_rows]
+        sample_types = store.samples["Sample_Type"].to_numpy()
+        present = [t for t in SAMPLE_TYPE_ORDER if (sample_types == t).any()]
+        blocks = {t: rows[:, sample_types == t] for t in present}
+        if box_stats is not None:
+            stats, positions = box_stats, gene_rows
+        else:
+            with stage("box_statistics", rows=len(missing)):
+                stats = {t: box_statistics(block) for t, block in blocks.items()}
+            positions = range(len(missing))
+
+        jobs = []
+        for i, (gene, position) in enumerate(zip(missing, positions)):
+            groups = []
+            for t in present:
+                values = blocks[t][i][~np.isnan(blocks[t][i])]
+                box = {key: float(stats[t][key][position])
+                       for key in ("q1", "med", "q3", "whislo", "whishi")}
+                groups.append((t, dict(box, label=t), values))
+            jobs.append(groups)
+
+        with stage("render_png", rows=len(missing)):
+            if workers > 1 and len(missing) > 1:
+                pool = _render_pool(workers)
+                rendered = list(pool.map(_render_png, missing, jobs, [style] * len(jobs)))
+            else:
+                rendered = [_render_png(gene, groups, style) for gene, groups in zip(missing, jobs)]
+        for gene, png in zip(missing, rendered):
+            images[gene] = png
+            cache.put(keys[gene], png)
+    return {gene: images[gene] for gene in genes}
@@ -0,0 +1,238 @@
+"""
+Several differential expression contrasts (e.g. each cancer type vs normal) held in one frame.
+
+Results come either as one file per contrast or as one long table with a `contrast`
+column. Either way they are parsed once into a single columnar frame whose rows are
+grouped by a categorical `contrast` key, so switching contrast is a slice of that frame
+rather than a re-parse, and a gene x contrast log2FC/padj summary is built once for
+cross-contrast comparison.
+"""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from dataset_cache import shared_cache
+from dataset_registry import shared_registry
+from de_pipeline import prepare_results
+from ingest import CATEGORY_COLUMNS
+from perf import stage
+from threshold_index import ThresholdIndex
+from transforms import DEFAULT_PADJ_FLOOR
+
+CONTRAST_COLUMN = "contrast"
+SUMMARY_VALUES = ("log2FoldChange", "padj")
+
+# Extensions removed from a file name to get its contrast name
+CONTRAST_SUFFIXES = (".gz", ".zst", ".csv", ".tsv", ".txt", ".parquet", ".pq", ".feather", ".arrow", ".ipc")
+
+
+def contrast_name(file):
+    """Contrast name for a result file without a contrast column: its base name without extensions."""
+    if isinstance(file, (str, os.PathLike)):
+        name = os.path.basename(os.fspath(file))
+    else:
+        name = os.path.basename(str(getattr(file, "name", None) or "contrast"))
+    stripped = True
+    while stripped:
+        stripped = False
+        for suffix in CONTRAST_SUFFIXES:
+            if name.lower().endswith(suffix) and len(name) > len(suffix):
+                name = name[:-len(suffix)]
+                stripped = True
+    return name
+
+
+class ContrastSet:
+    """
+    Result rows of several contrasts in one frame, grouped by contrast.
+
+    `frame` has the standard columns plus a categorical `contrast`; its rows are stably
+    ordered by contrast, so each contrast is the contiguous block `slices[name]`.
+    Per-contrast ThresholdIndexes and the gene x contrast summary are built on first use
+    and kept on the set, which is itself cached per upload (see load_contrasts).
+    """
+
+    def __init__(self, frame):
+        # Rows without a contrast are dropped; category codes are then summary columns
+        keep = frame[CONTRAST_COLUMN].notna().to_numpy()
+        if not keep.all():
+            frame = frame[keep]
+        frame = frame.assign(**{CONTRAST_COLUMN: frame[CONTRAST_COLUMN].cat.remove_unused_categories()})
+        codes = frame[CONTRAST_COLUMN].cat.codes.to_numpy()
+        if (np.diff(codes) < 0).any():
+            frame = frame.take(np.argsort(codes, kind="stable"))
+            codes = frame[CONTRAST_COLUMN].cat.codes.to_numpy()
+        self.frame = frame.reset_index(drop=True)
+        self.contrasts = [str(name) for name in frame[CONTRAST_COLUMN].cat.categories]
+        bounds = np.searchsorted(codes, np.arange(len(self.contrasts) + 1), side="left")
+        self.slices = {name: slice(int(start), int(stop))
+                       for name, start, stop in zip(self.contrasts, bounds[:-1], bounds[1:])}
+        self.key = None
+        self._indexes = {}
+        self._summary = None
+        self._summary_table = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.contrasts)
+
+    @property
+    def nbytes(self):
+        size = int(self.frame.memory_usage(deep=True).sum())
+        if self._summary is not None:
+            size += sum(self._summary[value].nbytes for value in SUMMARY_VALUES)
+        return size
+
+    def contrast_frame(self, name):
+        """Rows of contrast `name` as a shallow slice of the shared frame (columns may be added to it)."""
+        view = self.frame.iloc[self.slices[name]].copy(deep=False)
+        view.index = pd.RangeIndex(len(view))
+        return view
+
+    def threshold_index(self, name):
+        """ThresholdIndex of contrast_frame(name), built once per contrast."""
+        with self._lock:
+            index = self._indexes.get(name)
+        if index is None:
+            rows = self.frame.iloc[self.slices[name]]
+            with stage("build_threshold_index", rows=len(rows)):
+                index = ThresholdIndex.from_frame(rows)
+            with self._lock:
+                self._indexes[name] = index
+        return index
+
+    def summary(self):
+        """
+        Gene x contrast matrices of every contrast's results, built once.
+
+        Returns a dict with `genes` (an Index in first-seen order), `contrasts`, and
+        float32 `log2FoldChange` and float64 `padj` matrices (genes x contrasts, NaN where
+        a contrast has no row for the gene; a gene listed twice in one contrast keeps
+        its last row).
+        """
+        with self._lock:
+            if self._summary is not None:
+                return self._summary
+        with stage("contrast_summary", rows=len(self.frame)):
+            gene_codes, genes = pd.factorize(self.frame["Gene"], sort=False)
+            columns = self.frame[CONTRAST_COLUMN].cat.codes.to_numpy()
+            valid = gene_codes >= 0
+            summary = {"genes": pd.Index(genes, name="Gene"), "contrasts": list(self.contrasts)}
+            for value, dtype in zip(SUMMARY_VALUES, (np.float32, np.float64)):
+                matrix = np.full((len(genes), len(self.contrasts)), np.nan, dtype=dtype)
+                matrix[gene_codes[valid], columns[valid]] = \
+                    self.frame[value].to_numpy(dtype=dtype, na_value=np.nan)[valid]
+                summary[value] = matrix
+        with self._lock:
+            self._summary = summary
+        return summary
+
+    def summary_frame(self, value="log2FoldChange"):
+        """The `value` summary matrix as a genes x contrasts DataFrame."""
+        summary = self.summary()
+        return pd.DataFrame(summary[value], index=summary["genes"], columns=summary["contrasts"])
+
+    def summary_table(self):
+        """
+        One row per gene with `<contrast> log2FC` and `<contrast> padj` columns, built once.
+
+        Returned as a shallow copy, so callers can add columns (e.g. per-threshold counts).
+        """
+        with self._lock:
+            table = self._summary_table
+        if table is None:
+            table = self.summary_frame("log2FoldChange").add_suffix(" log2FC").join(
+                self.summary_frame("padj").add_suffix(" padj")).reset_index()
+            with self._lock:
+                self._summary_table = table
+        return table.copy(deep=False)
+
+    def significant_counts(self, logfc_threshold, padj_threshold):
+        """Number of contrasts in which each summary gene is significant (padj and |log2FC| thresholds)."""
+        summary = self.summary()
+        with np.errstate(invalid="ignore"):
+            significant = (summary["padj"] < padj_threshold) & \
+                (np.abs(summary["log2FoldChange"]) >= logfc_threshold)
+        return significant.sum(axis=1)
+
+
+def _as_categorical(values):
+    return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype(str).astype("category")
+
+
+def _unique_contrasts(values, used):
+    # Renames contrasts already taken by an earlier file to "name (2)", "name (3)", ...
+    renames = {}
+    for name in values.cat.categories:
+        label, n = name, 1
+        while label in used:
+            n += 1
+            label = f"{name} ({n})"
+        used.add(label)
+        renames[name] = label
+    return values.cat.rename_categories(renames)
+
+
+def _concat_categorical(frames):
+    # Gives every frame the union of the categories of each categorical column, so
+    # pd.concat keeps them categorical instead of falling back to object dtype
+    for name in CATEGORY_COLUMNS:
+        present = [df[name] for df in frames if name in df.columns]
+        if not present:
+            continue
+        dtype = pd.CategoricalDtype(union_categoricals([_as_categorical(values) for values in present]).categories)
+        for df in frames:
+            df[name] = df[name].astype(dtype) if name in df.columns else pd.Categorical([None] * len(df), dtype=dtype)
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_contrasts(files, progress=None, cache=None, padj_floor=DEFAULT_PADJ_FLOOR, holder=None):
+    """
+    Parses result files into one ContrastSet, cached by the files' content hashes.
+
+    Each file is read like a single upload (columns resolved by header, see
+    de_pipeline.prepare_results). A file with a `contrast` column contributes one
+    contrast per value; any other file is one contrast named after the file. A contrast
+    name already used by an earlier file gets a " (2)", " (3)", ... suffix. `progress`,
+    if given, is called with the fraction of the files parsed so far. With a `holder`
+    (see dataset_registry.session_holder) the set is taken from, and held in, the shared
+    dataset registry, so sessions uploading the same files use one read-only copy.
+    """
+    files = list(files)
+    cache = shared_cache() if cache is None else cache
+    with stage("load_contrasts") as info:
+        digests = [cache.digest(file) for file in files]
+        parts = [f"{digest}:{contrast_name(file)}" for digest, file in zip(digests, files)]
+        key = ("contrasts", hashlib.sha256("\n".join(parts).encode()).hexdigest(), repr(padj_floor))
+
+        def parse():
+            frames, used = [], set()
+            for i, file in enumerate(files):
+                file_progress = None if progress is None else (lambda f, i=i: progress((i + f) / len(files)))
+                df = prepare_results(file, progress=file_progress, padj_floor=padj_floor)
+                if CONTRAST_COLUMN in df.columns:
+                    df[CONTRAST_COLUMN] = _as_categorical(df[CONTRAST_COLUMN])
+                else:
+                    df[CONTRAST_COLUMN] = pd.Categorical([contrast_name(file)] * len(df))
+                df[CONTRAST_COLUMN] = _unique_contrasts(df[CONTRAST_COLUMN], used)
+                frames.append(df)
+            frame = _concat_categorical(frames)
+            contrasts = ContrastSet(frame)
+            contrasts.key = key[1]
+            contrasts.summary()
+            return contrasts
+
+        if holder is not None:
+            contrasts = shared_registry().acquire(key, holder, load=parse)
+        else:
+            contrasts = cache.get(key)
+            if contrasts is None:
+                contrasts = parse()
+                cache.put(key, contrasts)
+        info["rows"] = len(contrasts.frame)
+    return contrasts
@@ -0,0 +1,159 @@
+"""Content-hash keyed LRU cache of parsed, typed and derived result frames."""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from de_pipeline import prepare_results
+from perf import stage
+from threshold_index import ThresholdIndex
+from transforms import DEFAULT_PADJ_FLOOR
+
+# Memory budget shared by all sessions of one server process (override with DGE_CACHE_MAX_MB)
+DEFAULT_MAX_BYTES = int(os.environ.get("DGE_CACHE_MAX_MB", "512")) * 1024 ** 2
+
+# Number of upload file_id -> content hash entries remembered
+MAX_REMEMBERED_UPLOADS = 1024
+
+
+def content_hash(file):
+    """SHA-256 of a file's bytes (path or file object); the file position is preserved."""
+    digest = hashlib.sha256()
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+    elif hasattr(file, "getbuffer"):
+        digest.update(file.getbuffer())
+    else:
+        pos = file.tell()
+        file.seek(0)
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+        file.seek(pos)
+    return digest.hexdigest()
+
+
+class DatasetCache:
+    """
+    Thread-safe LRU cache of DataFrames (and per-dataset indexes) bounded by total memory usage.
+
+    Entries are keyed on (content hash, column mapping), so the same file uploaded
+    in different sessions or reruns is parsed once. Least recently used entries are
+    evicted once `max_bytes` is exceeded; a frame larger than the budget is not cached.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._hash_by_file_id = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, file, column_map):
+        return self.digest(file), json.dumps(sorted(column_map.items()))
+
+    def digest(self, file):
+        """content_hash of `file`, remembered per Streamlit upload so reruns skip re-hashing."""
+        file_id = getattr(file, "file_id", None)
+        with self._lock:
+            digest = self._hash_by_file_id.get(file_id) if file_id is not None else None
+        if digest is None:
+            digest = content_hash(file)
+            if file_id is not None:
+                with self._lock:
+                    self._hash_by_file_id[file_id] = digest
+                    if len(self._hash_by_file_id) > MAX_REMEMBERED_UPLOADS:
+                        self._hash_by_file_id.popitem(last=False)
+        return digest
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value):
+        if hasattr(value, "memory_usage"):
+            size = int(value.memory_usage(deep=True).sum())
+        else:
+            size = int(value.nbytes)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hash_by_file_id.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_cache():
+    """The process-wide cache, created on first use (module state is shared across sessions)."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = DatasetCache()
+        return _shared_cache
+
+
+def dataset_key(file, column_map, padj_floor=DEFAULT_PADJ_FLOOR, cache=None):
+    """Cache key of the frame load_dataset returns for `file` (also used by background loads)."""
+    cache = shared_cache() if cache is None else cache
+    return cache.key(file, column_map) + (repr(padj_floor),)
+
+
+def load_dataset(file, column_map, progress=None, cache=None, padj_floor=DEFAULT_PADJ_FLOOR):
+    """
+    Returns the parsed, typed frame for `file` with its derived `-log10(padj)` column.
+
+    Cache hits skip parsing and derivation entirely, so a rerun only has to rebuild the
+    threshold-dependent `Significant` mask. The result is a shallow copy: adding columns
+    to it does not touch the cached frame. `padj_floor` controls how padj == 0 is
+    handled (see transforms.padj_floor).
+    """
+    cache = shared_cache() if cache is None else cache
+    with stage("load_dataset") as info:
+        key = dataset_key(file, column_map, padj_floor, cache)
+        df = cache.get(key)
+        if df is None:
+            df = prepare_results(file, column_map, progress=progress, padj_floor=padj_floor)
+            cache.put(key, df)
+        info["rows"] = len(df)
+    return df.copy(deep=False)
+
+
+def load_threshold_index(file, column_map, df, cache=None):
+    """
+    Returns the ThresholdIndex of the frame `load_dataset` gave for `file`, building it once.
+
+    Threshold changes then become binary searches on the index instead of a full mask
+    and sort_values over the table.
+    """
+    cache = shared_cache() if cache is None else cache
+    key = cache.key(file, column_map) + ("threshold_index",)
+    index = cache.get(key)
+    if index is None or index.n_rows != len(df):
+        with stage("build_threshold_index", rows=len(df)):
+            index = ThresholdIndex.from_frame(df)
+        cache.put(key, index)
+    return index
@@ -0,0 +1,60 @@
+"""
+Lightweight dataset handles for st.cache_data-decorated functions.
+
+st.cache_data hashes every argument on every call to find the cached result, which for
+a DataFrame or a large array means reading all of its bytes, on every rerun. A
+DatasetHandle instead carries a fingerprint of the data computed once (a content hash
+such as ExpressionStore.digest or dataset_cache.dataset_key) and a description of the
+filters applied to it; passing HASH_FUNCS to st.cache_data makes Streamlit hash only
+those, so a cache lookup costs the same at a thousand rows as at millions. The data
+itself travels with the handle but is never hashed.
+"""
+
+
+class DatasetHandle:
+    """
+    Reference to a shared dataset (`source`), identified by `fingerprint` and `filters`.
+
+    `filters` is a tuple of sorted (name, value) pairs describing the selection made on
+    the dataset, e.g. (("cancer_type", "Lung Cancer"),). Two handles with the same
+    fingerprint and filters are equal and hash alike, whatever object they carry.
+    """
+
+    __slots__ = ("source", "fingerprint", "filters")
+
+    def __init__(self, source, fingerprint, filters=()):
+        self.source = source
+        self.fingerprint = fingerprint
+        self.filters = tuple(sorted(dict(filters).items()))
+
+    @property
+    def key(self):
+        """(fingerprint, filters): everything a cached result depends on."""
+        return self.fingerprint, self.filters
+
+    def where(self, **filters):
+        """A handle to the same dataset with `filters` added (or replaced)."""
+        return DatasetHandle(self.source, self.fingerprint, dict(self.filters, **filters))
+
+    def filter(self, name, default=None):
+        """Value of one filter, or `default` when it is not set."""
+        return dict(self.filters).get(name, default)
+
+    def __eq__(self, other):
+        return isinstance(other, DatasetHandle) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        filters = ", ".join(f"{name}={value!r}" for name, value in self.filters)
+        return f"DatasetHandle({str(self.fingerprint)[:12]}{', ' if filters else ''}{filters})"
+
+
+# For st.cache_data(hash_funcs=HASH_FUNCS): hash a handle by its key, never its data
+HASH_FUNCS = {DatasetHandle: lambda handle: handle.key}
+
+
+def store_handle(store, **filters):
+    """Handle to an ExpressionStore, fingerprinted by its digest (computed once per store)."""
+    return DatasetHandle(store, store.digest, filters)
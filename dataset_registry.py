@@ -0,0 +1,173 @@
+"""
+Process-wide registry of the datasets open in dashboard sessions, one read-only copy each.
+
+Sessions that open the same results file (same content hash and column mapping) get the
+same frame (or ContrastSet). The registry counts which sessions hold each dataset: while
+any session holds it, it stays in memory whatever the dataset cache budget; when the
+last one lets go (by opening another file or ending), it is handed to the shared
+DatasetCache, which keeps it until the LRU budget evicts it. Frames are frozen on
+registration, so no session can write into the shared copy; per-session state is
+limited to added columns (e.g. the Significant mask) on shallow copies, and row
+positions.
+"""
+
+import threading
+import weakref
+
+import numpy as np
+
+from dataset_cache import shared_cache
+
+
+def freeze_frame(df):
+    """Marks the NumPy memory behind `df`'s columns read-only (Arrow-backed columns already are)."""
+    for col in df.columns:
+        if not isinstance(df[col].dtype, np.dtype):
+            continue
+        values = df[col].to_numpy(copy=False)
+        # Freeze the owning array, not just this view of it
+        while isinstance(values.base, np.ndarray):
+            values = values.base
+        values.flags.writeable = False
+    return df
+
+
+def _register(value):
+    # Freezes a frame (or the frame of a ContrastSet) and returns its size in bytes
+    if hasattr(value, "memory_usage"):
+        freeze_frame(value)
+        return int(value.memory_usage(deep=True).sum())
+    freeze_frame(value.frame)
+    return int(value.nbytes)
+
+
+class DatasetRegistry:
+    """
+    Thread-safe, reference-counted map of dataset key -> shared frame; see the module docstring.
+
+    Values are DataFrames or objects with a `frame` and `nbytes` (ContrastSet), as in DatasetCache.
+
+    A holder is any hashable token for one user of one dataset, such as
+    (session id, slot) from session_holder(). It holds at most one dataset at a time:
+    acquiring another releases the previous one.
+    """
+
+    def __init__(self, cache=None):
+        self._cache = cache
+        self._entries = {}  # key -> [frame, size, holders]
+        self._held = {}  # holder -> key
+        self._load_locks = {}
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return shared_cache() if self._cache is None else self._cache
+
+    def get(self, key):
+        """The registered frame for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[0]
+
+    def acquire(self, key, holder, load=None):
+        """
+        Registers `holder` as a user of dataset `key` and returns its shared frame.
+
+        The frame comes from the registry, else from the dataset cache, else from `load()`
+        (called once even if several sessions ask at the same time). Returns None if the
+        dataset is nowhere and no `load` is given.
+        """
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        try:
+            with load_lock:
+                with self._lock:
+                    entry = self._entries.get(key)
+                if entry is None:
+                    frame = self.cache.get(key)
+                    if frame is None and load is not None:
+                        frame = load()
+                    if frame is None:
+                        return None
+                    size = _register(frame)
+                    with self._lock:
+                        entry = self._entries.setdefault(key, [frame, size, set()])
+                with self._lock:
+                    previous = self._held.get(holder)
+                    entry[2].add(holder)
+                    self._held[holder] = key
+        finally:
+            # Also when nothing was loaded (or load() raised), so no lock is left behind
+            with self._lock:
+                self._load_locks.pop(key, None)
+        if previous is not None and previous != key:
+            self._drop(previous, holder)
+        return entry[0]
+
+    def _drop(self, key, holder):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry[2].discard(holder)
+            if entry[2]:
+                return
+            del self._entries[key]
+        # Unused now: keep it around under the cache budget in case it is opened again
+        self.cache.put(key, entry[0])
+
+    def release(self, holder):
+        """Drops `holder`'s dataset reference (e.g. when its upload is removed)."""
+        with self._lock:
+            key = self._held.pop(holder, None)
+        if key is not None:
+            self._drop(key, holder)
+
+    def release_session(self, session_id):
+        """Releases every holder of a session, e.g. once the session has ended."""
+        with self._lock:
+            holders = [holder for holder in self._held if holder[0] == session_id]
+        for holder in holders:
+            self.release(holder)
+
+    def stats(self):
+        with self._lock:
+            return {"datasets": len(self._entries),
+                    "bytes": sum(entry[1] for entry in self._entries.values()),
+                    "holders": len(self._held)}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_shared_registry = None
+_shared_lock = threading.Lock()
+
+
+def shared_registry():
+    """The process-wide registry, created on first use."""
+    global _shared_registry
+    with _shared_lock:
+        if _shared_registry is None:
+            _shared_registry = DatasetRegistry()
+        return _shared_registry
+
+
+class _SessionToken:
+    # Lives in st.session_state; collected with the session, which releases its datasets
+    def __init__(self, session_id):
+        self.session_id = session_id
+
+
+def session_holder(slot="upload"):
+    """Holder token for this Streamlit session's `slot`; released automatically when the session ends."""
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    session_id = ctx.session_id if ctx is not None else "headless"
+    if "_dataset_registry_token" not in st.session_state:
+        token = _SessionToken(session_id)
+        weakref.finalize(token, shared_registry().release_session, session_id)
+        st.session_state["_dataset_registry_token"] = token
+    return session_id, slot
@@ -0,0 +1,164 @@
+"""
+Differential expression tests run for all genes at once on a genes x samples matrix.
+
+The long-format expression table (one row per gene and sample) is pivoted once into a
+dense matrix; Welch's t-test, the Mann-Whitney U test and the Benjamini-Hochberg
+adjustment are then computed row-wise with numpy, without a per-gene loop. Missing
+measurements (NaN) are ignored per gene.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import special
+from scipy.stats import rankdata
+
+TESTS = {
+    "Welch t-test": "welch",
+    "Mann-Whitney U": "mannwhitney",
+}
+RESULT_COLUMNS = ["Gene", "log2FoldChange", "statistic", "pvalue", "padj", "n_case", "n_control"]
+
+
+def expression_matrix(df, gene_col="Gene", sample_col="Sample_ID", group_col="Sample_Type",
+                      value_col="Log2_Expression"):
+    """
+    Pivots a long table into (genes, group labels per sample, genes x samples float64 matrix).
+
+    Genes and samples are factorized once and the values scattered into place, which is much
+    cheaper than a pivot_table/groupby. A (gene, sample) pair missing from the table is NaN;
+    if a pair appears more than once the last value wins.
+    """
+    gene_codes, genes = pd.factorize(df[gene_col], sort=True)
+    sample_codes, _ = pd.factorize(df[sample_col])
+    values = df[value_col].to_numpy(dtype=np.float64, na_value=np.nan)
+
+    matrix = np.full((len(genes), sample_codes.max() + 1 if len(sample_codes) else 0), np.nan)
+    matrix[gene_codes, sample_codes] = values
+
+    # One group label per sample (first occurrence)
+    first = np.unique(sample_codes, return_index=True)[1]
+    groups = df[group_col].iloc[first].to_numpy()
+    return np.asarray(genes), groups, matrix
+
+
+def _count_mean_var(x):
+    n = np.count_nonzero(~np.isnan(x), axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total = np.nansum(x, axis=1)
+        mean = total / n
+        var = np.nansum((x - mean[:, None]) ** 2, axis=1) / (n - 1)
+    return n, mean, var
+
+
+def welch_ttest(a, b):
+    """Row-wise Welch t statistic and two-sided p-value for matrices `a` and `b` (genes x samples)."""
+    return welch_from_moments(*_count_mean_var(a), *_count_mean_var(b))
+
+
+def welch_from_moments(n_a, mean_a, var_a, n_b, mean_b, var_b):
+    """Welch t statistic and two-sided p-value from per-gene group sizes, means and variances."""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        se_a, se_b = var_a / n_a, var_b / n_b
+        t = (mean_a - mean_b) / np.sqrt(se_a + se_b)
+        dof = (se_a + se_b) ** 2 / (se_a ** 2 / (n_a - 1) + se_b ** 2 / (n_b - 1))
+        p = 2 * special.stdtr(dof, -np.abs(t))
+    return t, p
+
+
+def _tie_term(x):
+    # Sum of (t^3 - t) over groups of tied values in each row. Rows are sorted and the
+    # flattened matrix split into runs of equal values; NaN never equals anything, so
+    # missing values are runs of length 1 and contribute nothing.
+    n_genes, n_samples = x.shape
+    if x.size == 0:
+        return np.zeros(n_genes)
+    s = np.sort(x, axis=1)
+    starts = np.ones(s.shape, dtype=bool)
+    starts[:, 1:] = s[:, 1:] != s[:, :-1]
+    run_starts = np.flatnonzero(starts.ravel())
+    lengths = np.diff(np.append(run_starts, x.size)).astype(np.float64)
+    return np.bincount(run_starts // n_samples, weights=lengths ** 3 - lengths, minlength=n_genes)
+
+
+def mann_whitney_u(a, b):
+    """
+    Row-wise Mann-Whitney U statistic (for `a`) and two-sided p-value.
+
+    Uses the normal approximation with tie and continuity correction, the same as
+    scipy.stats.mannwhitneyu(method="asymptotic").
+    """
+    x = np.concatenate([a, b], axis=1)
+    ranks = rankdata(x, axis=1, nan_policy="omit")
+    n_a = np.count_nonzero(~np.isnan(a), axis=1).astype(np.float64)
+    n_b = np.count_nonzero(~np.isnan(b), axis=1).astype(np.float64)
+    n = n_a + n_b
+
+    u_a = np.nansum(ranks[:, :a.shape[1]], axis=1) - n_a * (n_a + 1) / 2
+    u = np.maximum(u_a, n_a * n_b - u_a)
+    mu = n_a * n_b / 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sigma = np.sqrt(n_a * n_b / 12 * ((n + 1) - _tie_term(x) / (n * (n - 1))))
+        z = (u - mu - 0.5) / sigma
+        p = np.minimum(2 * special.ndtr(-z), 1.0)
+    p[(n_a == 0) | (n_b == 0)] = np.nan
+    return u_a, p
+
+
+def benjamini_hochberg(pvalues):
+    """Benjamini-Hochberg adjusted p-values; NaN stays NaN and is not counted as a test."""
+    p = np.asarray(pvalues, dtype=np.float64)
+    padj = np.full(p.shape, np.nan)
+    valid = np.flatnonzero(~np.isnan(p))
+    if valid.size == 0:
+        return padj
+    order = valid[np.argsort(p[valid], kind="stable")]
+    ranked = p[order] * valid.size / np.arange(1, valid.size + 1)
+    # Step-up: running minimum from the largest p-value down
+    padj[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return padj
+
+
+def differential_expression(df, test="welch", group_col="Sample_Type", case="Tumor",
+                            control="Normal", value_col="Log2_Expression"):
+    """
+    Tests every gene of a long Gene/Sample_ID/Sample_Type/Log2_Expression table, `case` vs `control`.
+
+    Returns one row per gene with the Gene, log2FoldChange and padj columns used by the
+    volcano dashboards (plus the test statistic, raw p-value and group sizes), sorted by
+    padj. log2FoldChange is the difference of group means of the (already log2) values.
+    """
+    if df.empty:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    genes, groups, matrix = expression_matrix(df, group_col=group_col, value_col=value_col)
+    return differential_expression_matrix(genes, groups, matrix, test, case, control)
+
+
+def differential_expression_matrix(genes, groups, matrix, test="welch", case="Tumor", control="Normal"):
+    """Same as differential_expression for an already pivoted genes x samples matrix."""
+    a = np.asarray(matrix[:, groups == case], dtype=np.float64)
+    b = np.asarray(matrix[:, groups == control], dtype=np.float64)
+
+    if test == "welch":
+        statistic, pvalue = welch_ttest(a, b)
+    elif test == "mannwhitney":
+        statistic, pvalue = mann_whitney_u(a, b)
+    else:
+        raise ValueError(f"Unknown test: {test!r}")
+
+    n_a, mean_a, _ = _count_mean_var(a)
+    n_b, mean_b, _ = _count_mean_var(b)
+    return results_frame(genes, n_a, mean_a, n_b, mean_b, statistic, pvalue)
+
+
+def results_frame(genes, n_a, mean_a, n_b, mean_b, statistic, pvalue):
+    """Results table (RESULT_COLUMNS) of per-gene group sizes, means and test results, sorted by padj."""
+    results = pd.DataFrame({
+        "Gene": genes,
+        "log2FoldChange": (mean_a - mean_b).astype(np.float32),
+        "statistic": statistic,
+        "pvalue": pvalue,
+        "padj": benjamini_hochberg(pvalue),
+        "n_case": n_a,
+        "n_control": n_b,
+    })
+    return results.sort_values("padj", kind="stable", na_position="last").reset_index(drop=True)
@@ -0,0 +1,63 @@
+"""Headless volcano/significance pipeline shared by the dashboards and the batch CLI."""
+
+import numpy as np
+import pandas as pd
+
+from ingest import read_de_table
+from perf import stage
+from schema_detect import detect_columns
+from transforms import DEFAULT_PADJ_FLOOR, neg_log10_padj
+
+REQUIRED_COLUMNS = {"Gene", "log2FoldChange", "padj"}
+
+
+def prepare_results(file, column_map=None, progress=None, padj_floor=DEFAULT_PADJ_FLOOR):
+    """
+    Loads a result table and adds its derived `-log10(padj)` column.
+
+    Columns are detected by name and content (schema_detect) unless `column_map` is given,
+    parsed with numeric types (see ingest.read_de_table) and transformed once. Raises
+    ValueError if Gene, log2FoldChange or padj cannot be found.
+    """
+    if column_map is None:
+        column_map = detect_columns(file)
+    missing = REQUIRED_COLUMNS - set(column_map.values())
+    if missing:
+        raise ValueError(f"Missing required columns: {sorted(missing)}")
+    with stage("read_de_table") as info:
+        df = read_de_table(file, column_map, progress=progress)
+        info["rows"] = len(df)
+    with stage("neg_log10_padj", rows=len(df)):
+        df["-log10(padj)"] = neg_log10_padj(df["padj"], floor=padj_floor)
+    return df
+
+
+def significance_mask(df, logfc_threshold, padj_threshold):
+    """
+    padj < padj_threshold and |log2FoldChange| >= logfc_threshold; NaN is never significant.
+
+    log2FoldChange is compared as float32, the dtype it is stored in (see ThresholdIndex).
+    """
+    padj = df["padj"].to_numpy(dtype=np.float64, na_value=np.nan)
+    log2fc = df["log2FoldChange"].to_numpy(dtype=np.float32, na_value=np.nan)
+    return (padj < padj_threshold) & (np.abs(log2fc) >= np.float32(logfc_threshold))
+
+
+def regulation_values(df):
+    """Sorted distinct regulation labels present in `df` (no NaN), without materializing a filtered column."""
+    values = df["regulation"]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = np.unique(values.cat.codes.to_numpy())
+        return sorted(values.cat.categories[codes[codes >= 0]])
+    return sorted(value for value in values.unique() if pd.notna(value))
+
+
+def regulation_mask(df, value):
+    """Boolean array of the rows whose regulation is `value`; NaN never matches."""
+    return (df["regulation"] == value).to_numpy(dtype=bool, na_value=False)
+
+
+def significant_genes(df, logfc_threshold, padj_threshold):
+    """Marks the `Significant` column and returns the significant rows sorted by padj."""
+    df["Significant"] = significance_mask(df, logfc_threshold, padj_threshold)
+    return df[df["Significant"]].sort_values("padj", kind="stable").reset_index(drop=True)
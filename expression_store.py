@@ -0,0 +1,106 @@
+"""Compact genes x samples expression store for the Analysis5 dashboard."""
+
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_COLUMNS = ["Sample_ID", "Sample_Type", "Cancer_Type"]
+
+
+class ExpressionStore:
+    """
+    Log2 expression as a dense float32 genes x samples matrix with per-sample metadata.
+
+    Samples (columns) are ordered by Cancer_Type, then Sample_Type, so every cancer type
+    and every (cancer type, sample type) block is a contiguous column range. Selecting a
+    cancer type is a basic slice of the matrix (a view, no copy), and a gene is one row
+    looked up through `gene_index`. At 4 bytes per measurement this is several times
+    smaller than the long one-row-per-(gene, sample) frame.
+    """
+
+    def __init__(self, genes, samples, matrix):
+        self.genes = np.asarray(genes, dtype=object)
+        self.samples = samples
+        self.matrix = matrix
+        self.gene_index = {gene: i for i, gene in enumerate(self.genes)}
+        self.cancer_slices = self._block_slices(["Cancer_Type"])
+        self.block_slices = self._block_slices(["Cancer_Type", "Sample_Type"])
+        self._digest = None
+
+    @classmethod
+    def from_long(cls, df, value_col="Log2_Expression"):
+        """Builds the store from a long Gene/Sample_ID/Sample_Type/Cancer_Type table."""
+        gene_codes, genes = pd.factorize(df["Gene"], sort=True)
+        sample_codes, _ = pd.factorize(df["Sample_ID"])
+
+        # One metadata row per sample (first occurrence), as categoricals
+        first = np.unique(sample_codes, return_index=True)[1]
+        samples = pd.DataFrame({col: pd.Categorical(df[col].iloc[first].to_numpy())
+                                for col in SAMPLE_COLUMNS})
+        order = np.lexsort((samples["Sample_Type"].cat.codes, samples["Cancer_Type"].cat.codes))
+        samples = samples.iloc[order].reset_index(drop=True)
+        column_of = np.empty(len(order), dtype=np.intp)
+        column_of[order] = np.arange(len(order))
+
+        matrix = np.full((len(genes), len(order)), np.nan, dtype=np.float32)
+        matrix[gene_codes, column_of[sample_codes]] = df[value_col].to_numpy(dtype=np.float32, na_value=np.nan)
+        # Stores are shared by all sessions (and their views share the matrix): keep it read-only
+        matrix.flags.writeable = False
+        return cls(genes, samples, matrix)
+
+    def _block_slices(self, columns):
+        # Contiguous column range of each group, in sample order
+        change = np.zeros(len(self.samples), dtype=bool)
+        change[:1] = True
+        for col in columns:
+            codes = self.samples[col].cat.codes.to_numpy()
+            change[1:] |= codes[1:] != codes[:-1]
+        starts = np.flatnonzero(change)
+        stops = np.append(starts[1:], len(self.samples))
+        keys = list(zip(*(self.samples[col].to_numpy()[starts] for col in columns)))
+        if len(columns) == 1:
+            keys = [key[0] for key in keys]
+        return {key: slice(int(start), int(stop)) for key, start, stop in zip(keys, starts, stops)}
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes + int(self.samples.memory_usage(deep=True).sum())
+
+    @property
+    def digest(self):
+        """SHA-256 of the matrix, gene names and sample metadata (computed once; views share it)."""
+        if self._digest is None:
+            digest = hashlib.sha256(np.ascontiguousarray(self.matrix).tobytes())
+            digest.update("\n".join(map(str, self.genes)).encode())
+            digest.update(self.samples.to_csv(index=False).encode())
+            self._digest = digest.hexdigest()
+        return self._digest
+
+    @property
+    def cancer_types(self):
+        return list(self.cancer_slices)
+
+    def cancer_view(self, cancer_type=None):
+        """Store restricted to one cancer type, sharing this store's matrix; None keeps all samples."""
+        if cancer_type is None:
+            return self
+        columns = self.cancer_slices.get(cancer_type, slice(0, 0))
+        view = ExpressionStore.__new__(ExpressionStore)
+        view.genes, view.gene_index = self.genes, self.gene_index
+        view._digest = self.digest  # identifies the dataset; the cancer type is keyed separately
+        view.matrix = self.matrix[:, columns]
+        view.samples = self.samples.iloc[columns].reset_index(drop=True)
+        view.cancer_slices = view._block_slices(["Cancer_Type"])
+        view.block_slices = view._block_slices(["Cancer_Type", "Sample_Type"])
+        return view
+
+    def gene_values(self, gene):
+        """Expression row of `gene` over this store's samples (a view)."""
+        return self.matrix[self.gene_index[gene]]
+
+    def gene_frame(self, gene):
+        """Small long-format frame (Sample_ID, Sample_Type, Cancer_Type, Log2_Expression) for plotting one gene."""
+        frame = self.samples.copy()
+        frame["Log2_Expression"] = self.gene_values(gene)
+        return frame.dropna(subset=["Log2_Expression"])
@@ -0,0 +1,177 @@
+"""Size-bounded LRU cache of rendered figures (PNG bytes or Vega-Lite JSON) with an optional disk tier."""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# Memory budget for rendered figures in one server process (override with DGE_FIGURE_CACHE_MB)
+DEFAULT_MAX_BYTES = int(os.environ.get("DGE_FIGURE_CACHE_MB", "128")) * 1024 ** 2
+
+# Optional second tier on disk, shared by server processes (set DGE_FIGURE_CACHE_DIR to enable)
+DEFAULT_DISK_DIR = os.environ.get("DGE_FIGURE_CACHE_DIR") or None
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get("DGE_FIGURE_CACHE_DISK_MB", "1024")) * 1024 ** 2
+
+# The disk tier is pruned back under its budget every this many writes
+DISK_PRUNE_INTERVAL = 64
+
+
+def figure_key(*parts):
+    """
+    Stable cache key for a figure from its inputs, e.g. (dataset hash, filter state, chart parameters).
+
+    Parts are JSON-encoded (tuples as lists, anything else via str) and hashed.
+    """
+    encoded = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class FigureCache:
+    """
+    Thread-safe LRU of rendered figures bounded by their total size in bytes.
+
+    Values are PNG bytes or Vega-Lite JSON strings. With a `disk_dir`, every stored figure
+    is also written there and memory misses fall back to it (disk hits are promoted back
+    into memory), so renders survive evictions and server restarts. `hits`, `disk_hits`
+    and `misses` count lookups since creation or the last clear().
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=DEFAULT_DISK_DIR,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._disk_writes = 0
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key, value=None):
+        # .png for bytes, .json for Vega-Lite specs; lookups try both
+        if value is None:
+            return [os.path.join(self.disk_dir, key[:2], key + ext) for ext in (".png", ".json")]
+        ext = ".png" if isinstance(value, bytes) else ".json"
+        return os.path.join(self.disk_dir, key[:2], key + ext)
+
+    def _read_disk(self, key):
+        for path in self._disk_path(key):
+            try:
+                with open(path, "rb") as handle:
+                    data = handle.read()
+            except OSError:
+                continue
+            os.utime(path)  # recency for disk pruning
+            return data if path.endswith(".png") else data.decode("utf-8")
+        return None
+
+    def _write_disk(self, key, value):
+        path = self._disk_path(key, value)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as handle:
+            handle.write(value if isinstance(value, bytes) else value.encode("utf-8"))
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % DISK_PRUNE_INTERVAL == 0
+        if prune:
+            self.prune_disk()
+
+    def prune_disk(self):
+        """Deletes the least recently used disk entries until the tier is within max_disk_bytes."""
+        if self.disk_dir is None:
+            return
+        files = []
+        for root, _, names in os.walk(self.disk_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+        value = self._read_disk(key) if self.disk_dir is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+        self._put_memory(key, value)
+        return value
+
+    def _put_memory(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def put(self, key, value):
+        self._put_memory(key, value)
+        if self.disk_dir is not None:
+            try:
+                self._write_disk(key, value)
+            except OSError:
+                pass  # the disk tier is best effort
+
+    def get_or_render(self, key, render):
+        """Cached figure for `key`, calling `render()` (returning PNG bytes or JSON) on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = render()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "entries": len(self._entries), "bytes": self.current_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.disk_hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared_figure_cache():
+    """The process-wide figure cache, created on first use."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = FigureCache()
+        return _shared_cache
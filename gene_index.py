@@ -0,0 +1,121 @@
+"""Gene-name search (symbols, aliases, Ensembl IDs) for datasets with tens of thousands of genes."""
+
+import bisect
+import os
+import re
+from itertools import accumulate
+
+import pandas as pd
+
+# Number of matches sent to the gene selectbox
+DEFAULT_LIMIT = 50
+
+# Optional local annotation table (symbol / aliases / Ensembl ID columns), CSV or TSV
+ANNOTATION_PATH = os.environ.get("DGE_GENE_ANNOTATION")
+
+ALIAS_SEPARATORS = re.compile(r"[|,;]\s*")
+
+
+def normalize_id(name):
+    """Case-folded identifier with any Ensembl version suffix dropped (ENSG00000141510.17 -> ensg00000141510)."""
+    name = str(name).strip().lower()
+    if name.startswith("ens") and "." in name:
+        name = name.split(".", 1)[0]
+    return name
+
+
+def _annotation_column(columns, *keywords, exclude=()):
+    for col in columns:
+        clean = col.strip().lower().replace(" ", "").replace("_", "")
+        if any(k in clean for k in keywords) and not any(k in clean for k in exclude):
+            return col
+    return None
+
+
+def load_annotation(path):
+    """
+    Reads an annotation table into a list of identifier groups, one per gene.
+
+    Columns are recognised by name: a symbol column ("symbol", "gene name", "gene"),
+    an Ensembl column ("ensembl", "gene id") and an alias column ("alias", "synonym",
+    with values separated by | , or ;). Missing columns are skipped.
+    """
+    sep = "\t" if path.lower().endswith((".tsv", ".txt", ".tsv.gz", ".txt.gz")) else ","
+    table = pd.read_csv(path, sep=sep, dtype=str)
+    columns = list(table.columns)
+    symbol_col = (_annotation_column(columns, "symbol", "genename")
+                  or _annotation_column(columns, "gene", exclude=("id", "ensembl", "alias", "synonym")))
+    ensembl_col = _annotation_column(columns, "ensembl", "geneid")
+    alias_col = _annotation_column(columns, "alias", "synonym")
+
+    groups = []
+    for row in table.itertuples(index=False):
+        row = dict(zip(columns, row))
+        names = [row[col] for col in (symbol_col, ensembl_col) if col is not None]
+        if alias_col is not None and isinstance(row[alias_col], str):
+            names.extend(ALIAS_SEPARATORS.split(row[alias_col]))
+        names = [name.strip() for name in names if isinstance(name, str) and name.strip()]
+        if names:
+            groups.append(names)
+    return groups
+
+
+class GeneSearchIndex:
+    """
+    Prefix and substring search over a dataset's gene names and their annotated synonyms.
+
+    Every searchable key (the gene column name, plus symbols, aliases and Ensembl IDs
+    from the annotation that refer to a gene in the dataset) is case-folded and sorted
+    once. Prefix matches are a binary search; substring matches are str.find over one
+    newline-joined string of all keys, so neither walks the keys in Python.
+    """
+
+    def __init__(self, genes, annotation=None):
+        self.genes = list(genes)
+        gene_by_id = {normalize_id(gene): gene for gene in self.genes}
+        entries = {(normalize_id(gene), gene) for gene in self.genes}
+        for names in annotation or ():
+            # An annotation row applies if any of its identifiers is a gene in the dataset
+            target = next((gene_by_id[normalize_id(n)] for n in names if normalize_id(n) in gene_by_id), None)
+            if target is not None:
+                entries.update((normalize_id(name), target) for name in names)
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.targets = [gene for _, gene in entries]
+        self._text = "\n".join(self.keys)
+        # Start of each key in the joined text, to map a find() position back to its key
+        self._offsets = [0, *accumulate(len(key) + 1 for key in self.keys[:-1])]
+
+    def __len__(self):
+        return len(self.genes)
+
+    def _prefix(self, query):
+        start = bisect.bisect_left(self.keys, query)
+        stop = bisect.bisect_left(self.keys, query + "\uffff", lo=start)
+        return range(start, stop)
+
+    def _substring(self, query):
+        pos = self._text.find(query)
+        while pos != -1:
+            i = bisect.bisect_right(self._offsets, pos) - 1
+            yield i
+            # Continue after this key so each key is reported once
+            pos = self._text.find(query, self._offsets[i] + len(self.keys[i]) + 1)
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Up to `limit` (gene, matched key) pairs: exact matches first, then prefix matches,
+        then other substring matches. An empty query returns the first genes in dataset order.
+        """
+        query = normalize_id(query)
+        if not query:
+            return [(gene, None) for gene in self.genes[:limit]]
+        results = {}
+        # The exact key sorts first in the prefix range, and prefix hits are a subset of
+        # the substring hits, so the substring scan only runs while results are short
+        for hits in (self._prefix(query), self._substring(query)):
+            for i in hits:
+                results.setdefault(self.targets[i], self.keys[i])
+                if len(results) >= limit:
+                    return list(results.items())
+        return list(results.items())
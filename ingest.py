@@ -0,0 +1,292 @@
+"""Column-pruned, chunked loading of differential expression result tables."""
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Extensions accepted by the dashboards' file uploaders
+UPLOAD_TYPES = ["csv", "gz", "zst", "parquet", "pq", "feather", "arrow", "ipc"]
+
+# Compact dtypes for the columns the dashboards use. padj stays float64: DESeq2/edgeR
+# report values far below the float32 range (~1e-38) that would otherwise collapse to 0.
+DE_DTYPES = {
+    "log2FoldChange": "float32",
+    "padj": "float64",
+}
+
+# Low-cardinality text columns parsed as categoricals
+CATEGORY_COLUMNS = ("regulation", "contrast")
+
+# Column mappings whose stats columns are known to hold non-numeric tokens (see mark_needs_coercion)
+_needs_coercion = set()
+_coercion_lock = threading.Lock()
+
+
+def standardize_columns(df):
+    """Renames the columns detected from names and a sample of values (see schema_detect) to standard names."""
+    from schema_detect import SAMPLE_ROWS, detect_schema
+
+    return df.rename(columns=detect_schema(df.head(SAMPLE_ROWS)))
+
+
+def header_signature(header):
+    """Stable hash of a file's column names, identifying files written by the same pipeline."""
+    return hashlib.sha256("\x1f".join(str(col) for col in header).encode()).hexdigest()
+
+
+def _column_map_key(column_map):
+    return tuple(sorted(column_map.items()))
+
+
+def needs_coercion(column_map):
+    """Whether files read with `column_map` were seen with non-numeric stats values."""
+    with _coercion_lock:
+        return _column_map_key(column_map) in _needs_coercion
+
+
+def mark_needs_coercion(column_map):
+    """Remembers that files read with `column_map` have non-numeric stats values, so they skip the typed attempt."""
+    with _coercion_lock:
+        _needs_coercion.add(_column_map_key(column_map))
+
+
+def resolve_columns(header):
+    """
+    Resolves a file header to a {raw column: standard name} mapping by column names alone.
+
+    Uses schema_detect's name scores (e.g. gene_name over gene_id, log2FoldChange over
+    lfcSE), so it agrees with detect_columns on the names it can decide without values.
+    """
+    from schema_detect import detect_header
+
+    return detect_header(header)
+
+
+def file_format(file):
+    """
+    Returns (format, compression) for a path or uploaded file based on its name:
+    ("parquet", None), ("feather", None) or ("csv", None | "gzip" | "zstd").
+    """
+    if isinstance(file, (str, os.PathLike)):
+        name = os.fspath(file)
+    else:
+        name = getattr(file, "name", None) or ""
+    name = str(name).lower()
+    if name.endswith((".parquet", ".pq")):
+        return "parquet", None
+    elif name.endswith((".feather", ".arrow", ".ipc")):
+        return "feather", None
+    elif name.endswith(".gz"):
+        return "csv", "gzip"
+    elif name.endswith(".zst"):
+        return "csv", "zstd"
+    return "csv", None
+
+
+def _arrow_source(file):
+    # Paths are memory-mapped and in-memory uploads wrapped without copying their bytes
+    import pyarrow as pa
+
+    if isinstance(file, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(file))
+    if hasattr(file, "getbuffer"):
+        return pa.BufferReader(pa.py_buffer(file.getbuffer()))
+    return file
+
+
+def _arrow_schema_names(file, fmt):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    source = _arrow_source(file)
+    if fmt == "parquet":
+        return pq.read_schema(source).names
+    return pa.ipc.open_file(source).schema.names
+
+
+def _read_arrow_table(file, fmt, columns=None, n_rows=None):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    source = _arrow_source(file)
+    if fmt == "parquet":
+        if n_rows is None:
+            return pq.read_table(source, columns=columns)
+        batches = pq.ParquetFile(source).iter_batches(batch_size=n_rows, columns=columns)
+        batch = next(batches, None)
+        return pa.Table.from_batches([batch]) if batch is not None else pq.read_schema(source).empty_table()
+    table = feather.read_table(source, columns=columns)
+    return table if n_rows is None else table.slice(0, n_rows)
+
+
+def _arrow_frame(table):
+    # Keep Arrow memory (zero-copy) for everything but dictionary columns, which become Categoricals
+    import pyarrow as pa
+
+    return table.to_pandas(types_mapper=lambda t: None if pa.types.is_dictionary(t) else pd.ArrowDtype(t))
+
+
+def sniff_header(file):
+    """Reads only the header (or schema) of a results file (path or file object) and rewinds it."""
+    fmt, compression = file_format(file)
+    if fmt != "csv":
+        return _arrow_schema_names(file, fmt)
+    if isinstance(file, (str, os.PathLike)):
+        return list(pd.read_csv(file, nrows=0, compression=compression).columns)
+    header = list(pd.read_csv(file, nrows=0, compression=compression).columns)
+    file.seek(0)
+    return header
+
+
+def preview_rows(file, n=5, columns=None):
+    """Reads the first `n` rows (of `columns`, default every column), for display before columns are chosen."""
+    fmt, compression = file_format(file)
+    if fmt != "csv":
+        return _arrow_frame(_read_arrow_table(file, fmt, columns=columns, n_rows=n))
+    if isinstance(file, (str, os.PathLike)):
+        return pd.read_csv(file, nrows=n, usecols=columns, compression=compression)
+    preview = pd.read_csv(file, nrows=n, usecols=columns, compression=compression)
+    file.seek(0)
+    return preview
+
+
+def _file_size(file):
+    size = getattr(file, "size", None)
+    if size is None:
+        pos = file.tell()
+        file.seek(0, os.SEEK_END)
+        size = file.tell()
+        file.seek(pos)
+    return size
+
+
+def _read_columnar(file, fmt, column_map):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # Column projection: only the mapped columns are read from the file
+    table = _read_arrow_table(file, fmt, columns=list(column_map))
+    table = table.rename_columns([column_map[col] for col in table.column_names])
+    for name, dt in DE_DTYPES.items():
+        if name not in table.column_names:
+            continue
+        i = table.column_names.index(name)
+        column = table.column(i)
+        target = pa.from_numpy_dtype(np.dtype(dt))
+        if pa.types.is_integer(column.type) or pa.types.is_floating(column.type):
+            column = pc.cast(column, target)
+        else:
+            # Text stats column: coerce like pd.to_numeric(errors="coerce")
+            column = pa.array(pd.to_numeric(column.to_pandas(), errors="coerce"), type=target)
+        table = table.set_column(i, name, column)
+    for name in CATEGORY_COLUMNS:
+        if name in table.column_names:
+            i = table.column_names.index(name)
+            table = table.set_column(i, name, pc.dictionary_encode(table.column(i)))
+    return _arrow_frame(table)
+
+
+def iter_csv_chunks(file, column_map, chunksize=DEFAULT_CHUNKSIZE, coerce=False, compression=None,
+                    first_rows=None):
+    """
+    Yields typed chunks (standard column names) of a CSV results file object.
+
+    Only the mapped columns are parsed. With `coerce`, non-numeric stats tokens become NaN;
+    otherwise they raise ValueError. `first_rows`, if given, sizes the first chunk, so a
+    caller can show the start of a large file before the rest is parsed.
+    """
+    usecols = list(column_map)
+    dtype = {}
+    for col, name in column_map.items():
+        if name in DE_DTYPES and not coerce:
+            dtype[col] = DE_DTYPES[name]
+        elif name in CATEGORY_COLUMNS:
+            dtype[col] = "category"
+
+    reader = pd.read_csv(file, usecols=usecols, dtype=dtype, chunksize=chunksize, compression=compression)
+    with reader:
+        size = first_rows or chunksize
+        while True:
+            try:
+                chunk = reader.get_chunk(size)
+            except StopIteration:
+                return
+            size = chunksize
+            chunk = chunk.rename(columns=column_map)
+            if coerce:
+                # Non-numeric tokens (e.g. "NA", "-") become NaN, as with pd.to_numeric(errors="coerce")
+                for name, dt in DE_DTYPES.items():
+                    if name in chunk.columns:
+                        chunk[name] = pd.to_numeric(chunk[name], errors="coerce").astype(dt)
+            yield chunk
+
+
+def combine_chunks(chunks, columns):
+    """Concatenates parsed chunks, keeping categorical columns categorical; `columns` names an empty result."""
+    if not chunks:
+        return pd.DataFrame(columns=list(columns))
+    # Chunks carry their own categories; union them so the result stays categorical
+    categories = {name: union_categoricals([chunk[name] for chunk in chunks])
+                  for name in CATEGORY_COLUMNS if name in chunks[0].columns}
+    df = pd.concat(chunks, ignore_index=True)
+    for name, values in categories.items():
+        df[name] = values
+    return df
+
+
+def _read_chunks(file, column_map, chunksize, coerce, progress, compression=None):
+    total = _file_size(file) or 1
+    chunks = []
+    for chunk in iter_csv_chunks(file, column_map, chunksize, coerce, compression):
+        chunks.append(chunk)
+        if progress is not None:
+            progress(min(file.tell() / total, 1.0))
+    return chunks
+
+
+def read_de_table(file, column_map=None, chunksize=DEFAULT_CHUNKSIZE, progress=None):
+    """
+    Reads a differential expression table keeping only the columns the dashboards use.
+
+    Parquet and Feather/Arrow IPC files are read with column projection into Arrow-backed
+    columns without re-parsing text; CSV (optionally gzip/zstd compressed) is streamed.
+    The header is sniffed first and resolved with `resolve_columns` (unless an explicit
+    {raw column: standard name} `column_map` is given); only those columns are then parsed,
+    `chunksize` rows at a time, with compact dtypes (float32 log2FoldChange, categorical
+    regulation and contrast). `progress`, if given, is called with the fraction of bytes parsed so far.
+    Returns a DataFrame with standard column names.
+    """
+    fmt, compression = file_format(file)
+    if column_map is None:
+        column_map = resolve_columns(sniff_header(file))
+
+    if fmt != "csv":
+        df = _read_columnar(file, fmt, column_map)
+        if progress is not None:
+            progress(1.0)
+        return df
+
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as handle:
+            return read_de_table(handle, column_map, chunksize, progress)
+
+    start = file.tell()
+    coerce = needs_coercion(column_map)
+    try:
+        chunks = _read_chunks(file, column_map, chunksize, coerce, progress, compression)
+    except ValueError:
+        if coerce:
+            raise
+        # A stats column holds non-numeric values; re-read it as text and coerce
+        mark_needs_coercion(column_map)
+        file.seek(start)
+        chunks = _read_chunks(file, column_map, chunksize, True, progress, compression)
+    file.seek(start)
+    return combine_chunks(chunks, column_map.values())
@@ -0,0 +1,200 @@
+"""
+Memory-mapped on-disk store for wide (samples x genes) expression matrices.
+
+A wide table (one row per sample, one column per gene) is converted once, in row
+chunks, into a directory holding matrix.npy (float32, genes x samples, so one gene
+is one contiguous row) and meta.json (gene and sample names). The dashboards open
+it with np.load(mmap_mode="r") and only the gene rows or sample blocks being
+viewed are paged in, so resident memory does not grow with the cohort.
+
+Example (convert an on-disk cohort ahead of time):
+    python matrix_store.py cohort.csv.gz --sample-column Sample
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from dataset_cache import shared_cache
+from ingest import _arrow_source, _read_arrow_table, file_format, sniff_header
+from perf import stage
+
+# Converted matrices live here, one directory per (content hash, sample column)
+DEFAULT_ROOT = os.environ.get("DGE_MATRIX_DIR", os.path.join(tempfile.gettempdir(), "dge_matrices"))
+
+# Values parsed per conversion chunk (rows x genes); bounds memory while converting
+TARGET_CHUNK_CELLS = 5_000_000
+
+MATRIX_FILE = "matrix.npy"
+META_FILE = "meta.json"
+
+
+class MatrixStore:
+    """Read-only view of a converted matrix directory; the matrix itself stays on disk."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as handle:
+            meta = json.load(handle)
+        self.sample_column = meta["sample_column"]
+        self.genes = meta["genes"]
+        self.samples = meta["samples"]
+        self.matrix = np.load(os.path.join(path, MATRIX_FILE), mmap_mode="r")
+        self.gene_index = {gene: i for i, gene in enumerate(self.genes)}
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def gene_values(self, gene):
+        """Expression of `gene` across all samples; reads one row from disk."""
+        return np.array(self.matrix[self.gene_index[gene]])
+
+    def sample_block(self, start, stop, genes=None):
+        """genes x samples[start:stop] block as an in-memory array (all genes if `genes` is None)."""
+        if genes is None:
+            return np.array(self.matrix[:, start:stop])
+        rows = [self.gene_index[gene] for gene in genes]
+        return np.array(self.matrix[rows, start:stop])
+
+    def gene_frame(self, gene, value_name="Expression"):
+        """Sample / expression frame of one gene, for plotting."""
+        return pd.DataFrame({"Sample": self.samples, value_name: self.gene_values(gene)})
+
+
+@lru_cache(maxsize=16)
+def _open_store(path):
+    return MatrixStore(path)
+
+
+def _iter_row_chunks(file, fmt, compression, columns, chunk_rows, dtype=None):
+    # Wide table in row chunks restricted to `columns`, as DataFrames
+    if fmt == "csv":
+        yield from pd.read_csv(file, usecols=columns, dtype=dtype, chunksize=chunk_rows,
+                               compression=compression)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(_arrow_source(file)).iter_batches(batch_size=chunk_rows, columns=columns):
+            yield batch.to_pandas()
+    else:
+        table = _read_arrow_table(file, fmt, columns=columns)
+        for batch in table.to_batches(max_chunksize=chunk_rows):
+            yield batch.to_pandas()
+
+
+def _rewind(file):
+    if not isinstance(file, (str, os.PathLike)):
+        file.seek(0)
+
+
+def convert_wide_table(file, out_dir, sample_column, progress=None):
+    """
+    Converts a wide CSV (optionally gzip/zstd), Parquet or Feather matrix into `out_dir`.
+
+    The sample column is read first to size the output; gene columns are then parsed
+    TARGET_CHUNK_CELLS values at a time as float32 (non-numeric values become NaN) and
+    written transposed into the memory-mapped matrix. `progress`, if given, is called
+    with the fraction of samples written.
+    """
+    fmt, compression = file_format(file)
+    header = sniff_header(file)
+    if sample_column not in header:
+        raise ValueError(f"Sample column {sample_column!r} not found")
+    genes = [col for col in header if col != sample_column]
+    chunk_rows = max(1, TARGET_CHUNK_CELLS // max(len(genes), 1))
+
+    parts = [chunk[sample_column] for chunk in
+             _iter_row_chunks(file, fmt, compression, [sample_column], 1_000_000)]
+    samples = pd.concat(parts, ignore_index=True) if parts else pd.Series([], dtype=object)
+    _rewind(file)
+
+    os.makedirs(out_dir, exist_ok=True)
+    matrix = np.lib.format.open_memmap(os.path.join(out_dir, MATRIX_FILE), mode="w+",
+                                       dtype=np.float32, shape=(len(genes), len(samples)))
+    dtype = {gene: "float32" for gene in genes} if fmt == "csv" else None
+    try:
+        chunks = _iter_row_chunks(file, fmt, compression, genes, chunk_rows, dtype)
+        _write_chunks(matrix, chunks, genes, progress)
+    except ValueError:
+        # Some cells are not numeric; re-read as text and coerce them to NaN
+        _rewind(file)
+        chunks = _iter_row_chunks(file, fmt, compression, genes, chunk_rows)
+        _write_chunks(matrix, chunks, genes, progress)
+    _rewind(file)
+    matrix.flush()
+    del matrix
+
+    meta = {
+        "sample_column": sample_column,
+        "genes": genes,
+        "samples": samples.astype(str).tolist(),
+    }
+    with open(os.path.join(out_dir, META_FILE), "w", encoding="utf-8") as handle:
+        json.dump(meta, handle)
+
+
+def _write_chunks(matrix, chunks, genes, progress):
+    start = 0
+    for chunk in chunks:
+        values = chunk[genes]
+        if not all(dt == np.float32 for dt in values.dtypes):
+            values = values.apply(pd.to_numeric, errors="coerce")
+        stop = start + len(values)
+        matrix[:, start:stop] = values.to_numpy(dtype=np.float32, na_value=np.nan).T
+        start = stop
+        if progress is not None:
+            progress(min(stop / max(matrix.shape[1], 1), 1.0))
+
+
+def open_matrix(file, sample_column, root=DEFAULT_ROOT, progress=None):
+    """
+    Returns the MatrixStore for an uploaded or on-disk wide matrix, converting it on first use.
+
+    Converted directories are keyed on the file's content hash and the sample column, so
+    the same cohort is converted once per host no matter how often it is uploaded.
+    Conversion writes to a temporary directory that is renamed into place when complete.
+    """
+    digest = shared_cache().digest(file)
+    column_tag = hashlib.sha256(sample_column.encode()).hexdigest()[:12]
+    path = os.path.join(root, f"{digest}-{column_tag}")
+    if not os.path.exists(os.path.join(path, META_FILE)):
+        os.makedirs(root, exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(prefix=".converting-", dir=root)
+        try:
+            with stage("convert_matrix"):
+                convert_wide_table(file, tmp_dir, sample_column, progress=progress)
+            os.replace(tmp_dir, path)
+        except OSError:
+            # Another session finished the same conversion first
+            if not os.path.exists(os.path.join(path, META_FILE)):
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    return _open_store(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a wide expression matrix to the memory-mapped store.")
+    parser.add_argument("input", help="wide CSV (.csv/.gz/.zst), Parquet or Feather file")
+    parser.add_argument("--sample-column", help="sample ID column (default: first column)")
+    parser.add_argument("--root", default=DEFAULT_ROOT, help="directory holding converted matrices")
+    args = parser.parse_args(argv)
+
+    sample_column = args.sample_column or sniff_header(args.input)[0]
+    store = open_matrix(args.input, sample_column, root=args.root,
+                        progress=lambda f: print(f"\r{f:6.1%}", end="", file=sys.stderr))
+    print(f"\n{store.shape[0]} genes x {store.shape[1]} samples -> {store.path}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Array-based generator for simulated tumor/normal gene expression cohorts."""
+
+import numpy as np
+import pandas as pd
+
+CANCER_TYPES = ['Breast Cancer', 'Lung Cancer', 'Colon Cancer', 'Prostate Cancer']
+SAMPLE_TYPES = ['Tumor', 'Normal']
+
+# Differentially expressed genes: gene -> {cancer type: (tumor/normal fold change,
+# tumor sd as a fraction of the normal base expression)}. Genes listed here without a
+# matching cancer type only get a small (0.9-1.1x) change, with sd `noise` x base.
+DE_GENE_SPEC = {
+    'Gene1': {'Breast Cancer': (5.0, 0.5)},
+    'Gene2': {'Breast Cancer': (5.0, 0.5)},
+    'Gene3': {'Lung Cancer': (4.0, 0.4)},
+    'Gene4': {},
+    'Gene5': {},
+    'Gene10': {'Colon Cancer': (0.2, 0.05)},
+    'Gene11': {},
+    'Gene12': {},
+}
+
+
+def generate_mock_cohort(n_genes=100, n_patients=25, cancer_types=CANCER_TYPES,
+                         de_genes=DE_GENE_SPEC, noise=0.1, rng=None):
+    """
+    Generates a long-format mock cohort with one Tumor and one Normal sample per patient.
+
+    Every random draw is a single batched NumPy call over a (patients x genes) array,
+    so 20k genes x 1,000 patients builds in seconds. `rng` may be a seed or an
+    `np.random.Generator`; the same seed always yields the same frame.
+    Columns: Gene, Sample_ID, Expression_Value, Sample_Type, Cancer_Type, Log2_Expression.
+    """
+    rng = np.random.default_rng(rng)
+    cancer_types = list(cancer_types)
+    genes = [f'Gene{i}' for i in range(1, n_genes + 1)]
+    patient_ids = [f'Patient{i}' for i in range(1, n_patients + 1)]
+
+    # Assign a random cancer type to each patient
+    patient_cancer = rng.integers(len(cancer_types), size=n_patients)
+
+    # Base expression for normal tissue and a small tumor/normal variation for non-DE genes
+    base_expr_normal = rng.uniform(5, 50, size=(n_patients, n_genes))
+    fold = rng.uniform(0.8, 1.2, size=(n_patients, n_genes))
+    tumor_sd = noise * base_expr_normal * fold  # noise proportional to the tumor mean
+
+    # Introduce differential expression for the genes in the spec (loops over spec entries only)
+    gene_pos = {gene: i for i, gene in enumerate(genes)}
+    for gene, per_cancer in de_genes.items():
+        j = gene_pos.get(gene)
+        if j is None:
+            continue
+        fold[:, j] = rng.uniform(0.9, 1.1, size=n_patients)
+        tumor_sd[:, j] = noise * base_expr_normal[:, j]
+        for cancer_type, (fold_change, sd_fraction) in per_cancer.items():
+            if cancer_type in cancer_types:
+                rows = patient_cancer == cancer_types.index(cancer_type)
+                fold[rows, j] = fold_change
+                tumor_sd[rows, j] = sd_fraction * base_expr_normal[rows, j]
+
+    # Draw tumor and normal expression in one call each
+    tumor_expr = rng.normal(base_expr_normal * fold, tumor_sd)
+    normal_expr = rng.normal(base_expr_normal, noise * base_expr_normal)
+
+    # (patients, genes, sample type) -> one row per measurement, Tumor before Normal
+    expression = np.stack([tumor_expr, normal_expr], axis=-1).astype(np.float32).ravel()
+    np.maximum(expression, 0.1, out=expression)  # Ensure non-negative expression values
+
+    # Build categorical columns straight from integer codes
+    n_types = len(SAMPLE_TYPES)
+    type_codes = np.tile(np.arange(n_types), n_patients * n_genes)
+    gene_codes = np.tile(np.repeat(np.arange(n_genes), n_types), n_patients)
+    sample_codes = np.repeat(n_types * np.arange(n_patients), n_types * n_genes) + type_codes
+    cancer_codes = np.repeat(patient_cancer, n_types * n_genes)
+    sample_ids = [f'{patient}_{cancer_types[c]}_{sample_type}'
+                  for patient, c in zip(patient_ids, patient_cancer)
+                  for sample_type in SAMPLE_TYPES]
+
+    return pd.DataFrame({
+        'Gene': pd.Categorical.from_codes(gene_codes, categories=genes),
+        'Sample_ID': pd.Categorical.from_codes(sample_codes, categories=sample_ids),
+        'Expression_Value': expression,
+        'Sample_Type': pd.Categorical.from_codes(type_codes, categories=SAMPLE_TYPES),
+        'Cancer_Type': pd.Categorical.from_codes(cancer_codes, categories=cancer_types),
+        # Convert expression values to log2 for better visualization of differences
+        'Log2_Expression': np.log2(expression),
+    })
@@ -0,0 +1,85 @@
+"""Paged, lazily materialized table of result rows for the Streamlit dashboards."""
+
+import io
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from perf import stage
+
+DEFAULT_PAGE_SIZE = 100
+EXPORT_CHUNK_ROWS = 50_000
+DEFAULT_ORDER = "Default (padj)"
+
+
+def search_rows(df, rows, text, column="Gene"):
+    """Keeps the positions in `rows` whose gene name contains `text` (case-insensitive)."""
+    if not text:
+        return rows
+    names = pd.Series(df[column].to_numpy()[rows], dtype="str")
+    return rows[names.str.contains(text, case=False, regex=False).to_numpy(dtype=bool, na_value=False)]
+
+
+def sort_rows(df, rows, column, ascending=True):
+    """Reorders the positions in `rows` by `column`, sorting only those rows (NaN last)."""
+    values = df[column].iloc[rows].reset_index(drop=True)
+    order = values.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+    return rows[order]
+
+
+def export_csv(df, rows, chunk_rows=EXPORT_CHUNK_ROWS):
+    """CSV bytes of df.iloc[rows], written a chunk at a time instead of copying the whole subset."""
+    buffer = io.StringIO()
+    for start in range(0, len(rows), chunk_rows):
+        df.iloc[rows[start:start + chunk_rows]].to_csv(buffer, header=start == 0, index=False)
+    if len(rows) == 0:
+        df.iloc[:0].to_csv(buffer, index=False)
+    return buffer.getvalue().encode()
+
+
+def paged_table(df, rows, key, page_size=DEFAULT_PAGE_SIZE, file_name="significant_genes.csv"):
+    """
+    Shows df.iloc[rows] one page at a time.
+
+    `rows` are row positions in their default order (e.g. by padj from ThresholdIndex), so
+    the default view needs no sorting. Gene search and sorting on another column are done
+    server-side on the positions; only the visible page is materialized and sent to the
+    browser. The full (searched, sorted) table is exported by a separate download button
+    that builds the CSV in chunks only when clicked.
+    """
+    rows = np.asarray(rows)
+    search_col, sort_col, order_col = st.columns([2, 2, 1])
+    with search_col:
+        search = st.text_input("Search gene", key=f"{key}_search")
+    with sort_col:
+        sort_by = st.selectbox("Sort by", [DEFAULT_ORDER] + list(df.columns), key=f"{key}_sort")
+    with order_col:
+        descending = st.checkbox("Descending", key=f"{key}_desc")
+
+    with stage("search_rows", rows=len(rows)):
+        rows = search_rows(df, rows, search)
+    if sort_by != DEFAULT_ORDER:
+        with stage("sort_rows", rows=len(rows)):
+            rows = sort_rows(df, rows, sort_by, ascending=not descending)
+    elif descending:
+        rows = rows[::-1]
+
+    # Back to the first page when the search or ordering changes; clamp otherwise
+    n_pages = max(1, -(-len(rows) // page_size))
+    page_key, query_key = f"{key}_page", f"{key}_query"
+    query = (search, sort_by, descending)
+    if st.session_state.get(query_key, query) != query:
+        st.session_state[page_key] = 1
+    elif st.session_state.get(page_key, 1) > n_pages:
+        st.session_state[page_key] = n_pages
+    st.session_state[query_key] = query
+    page = st.number_input("Page", min_value=1, max_value=n_pages, step=1, key=page_key)
+
+    start = (page - 1) * page_size
+    page_rows = rows[start:start + page_size]
+    st.dataframe(df.iloc[page_rows].reset_index(drop=True))
+    st.caption(f"Rows {min(start + 1, len(rows))}-{start + len(page_rows)} of {len(rows):,}")
+
+    st.download_button("Download full table (CSV)", data=lambda: export_csv(df, rows),
+                       file_name=file_name, mime="text/csv", on_click="ignore", key=f"{key}_download")
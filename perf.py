@@ -0,0 +1,166 @@
+"""
+Lightweight per-stage instrumentation for the dashboards.
+
+A dashboard calls start_run() at the top of its script; code anywhere below (including
+the shared modules) wraps work in `with stage("name") as info:` and may set
+info["rows"]. Each finished stage records wall time, rows processed and, when memory
+tracing is on, the peak traced allocation during the stage. Records can be shown in the
+sidebar with performance_panel(). They are emitted as JSON lines at INFO level on the
+"dge.perf" logger, which is quiet by default: set DGE_PERF_LOG to write them to a file,
+or enable INFO on that logger. Outside a run, stage() only costs a context lookup.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+# Optional JSON-lines file for scraping; otherwise configure the "dge.perf" logger
+PERF_LOG_PATH = os.environ.get("DGE_PERF_LOG")
+
+# Trace peak memory per stage even without the panel (tracemalloc slows Python allocations)
+TRACE_MEMORY = os.environ.get("DGE_PERF_TRACE_MEMORY", "0") == "1"
+
+logger = logging.getLogger("dge.perf")
+
+_current_run = contextvars.ContextVar("dge_perf_run", default=None)
+_handler_lock = threading.Lock()
+_file_handler = None
+_tracing_started = False
+
+
+def _ensure_file_handler():
+    global _file_handler
+    if PERF_LOG_PATH is None or _file_handler is not None:
+        return
+    with _handler_lock:
+        if _file_handler is None:
+            _file_handler = logging.FileHandler(PERF_LOG_PATH)
+            _file_handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(_file_handler)
+            logger.setLevel(logging.INFO)
+
+
+class PerfRun:
+    """Stage records of one script run (one Streamlit rerun or one headless call)."""
+
+    def __init__(self, dashboard, trace_memory=TRACE_MEMORY):
+        self.dashboard = dashboard
+        self.run_id = uuid.uuid4().hex[:12]
+        self.trace_memory = trace_memory
+        self.records = []
+        self._depth = 0
+        # [start bytes, highest peak seen] of each open stage that traces memory
+        self._memory_stack = []
+
+    def record(self, name, seconds, rows=None, peak_bytes=None):
+        entry = {
+            "ts": round(time.time(), 3),
+            "dashboard": self.dashboard,
+            "run": self.run_id,
+            "stage": name,
+            "depth": self._depth,
+            "seconds": round(seconds, 6),
+            "rows": rows,
+            "peak_mb": None if peak_bytes is None else round(peak_bytes / 1024 ** 2, 3),
+        }
+        self.records.append(entry)
+        _ensure_file_handler()
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(entry))
+        return entry
+
+    def frame(self):
+        columns = ["stage", "seconds", "rows", "peak_mb"]
+        if not self.records:
+            return pd.DataFrame(columns=columns)
+        frame = pd.DataFrame(self.records)
+        # Indent nested stages (e.g. parse inside load_dataset)
+        frame["stage"] = ["  " * depth + name for depth, name in zip(frame["depth"], frame["stage"])]
+        frame["rows"] = frame["rows"].astype("Int64")
+        return frame[columns]
+
+
+def start_run(dashboard, trace_memory=TRACE_MEMORY):
+    """
+    Starts recording the stages of this script run (per thread/context) and returns the run.
+
+    tracemalloc is process-wide: it is started by a run that traces memory and stopped by
+    the next run that does not, so it costs nothing while no one is looking at the panel.
+    """
+    global _tracing_started
+    with _handler_lock:
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        elif not trace_memory and _tracing_started and not TRACE_MEMORY:
+            tracemalloc.stop()
+            _tracing_started = False
+    run = PerfRun(dashboard, trace_memory=trace_memory)
+    _current_run.set(run)
+    return run
+
+
+def current_run():
+    return _current_run.get()
+
+
+@contextmanager
+def stage(name, rows=None):
+    """
+    Times the enclosed block as stage `name` of the current run (no-op without one).
+
+    Yields a dict; set info["rows"] inside the block when the row count is only known then.
+    Peak memory is the tracemalloc peak during the stage, relative to its start.
+    """
+    info = {"rows": rows}
+    run = _current_run.get()
+    if run is None:
+        yield info
+        return
+    tracing = run.trace_memory and tracemalloc.is_tracing()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        # reset_peak() is global, so hand the peak so far to the enclosing stage first
+        if run._memory_stack:
+            run._memory_stack[-1][1] = max(run._memory_stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        run._memory_stack.append([current, current])
+    run._depth += 1
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - start
+        run._depth -= 1
+        peak = None
+        if tracing and tracemalloc.is_tracing():
+            start_bytes, seen = run._memory_stack.pop()
+            highest = max(seen, tracemalloc.get_traced_memory()[1])
+            if run._memory_stack:
+                run._memory_stack[-1][1] = max(run._memory_stack[-1][1], highest)
+            peak = highest - start_bytes
+        elif tracing:
+            run._memory_stack.pop()
+        rows = info.get("rows")
+        run.record(name, seconds, rows=None if rows is None else int(rows), peak_bytes=peak)
+
+
+def performance_panel(run=None):
+    """Sidebar "Performance" expander listing the stages of the run (in completion order)."""
+    import streamlit as st
+
+    run = current_run() if run is None else run
+    if run is None:
+        return
+    with st.sidebar.expander("Performance", expanded=True):
+        st.dataframe(run.frame(), hide_index=True)
+        total = sum(record["seconds"] for record in run.records if record["depth"] == 0)
+        st.caption(f"Run {run.run_id}: {total:.3f} s in top-level stages")
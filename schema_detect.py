@@ -0,0 +1,203 @@
+"""
+Column auto-detection for differential expression result tables.
+
+Header names alone are ambiguous (gene_name / gene_biotype / GeneID all contain "gene",
+log2FoldChange / lfcSE both look like fold changes), so each column is scored on its name
+and on a sample of its values: padj must lie in [0, 1], log2FC should be roughly
+symmetric around 0, the gene column is a high-cardinality text column and regulation a
+low-cardinality one. Detected mappings are remembered per header signature, so further
+uploads from the same pipeline skip the sampling.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from ingest import header_signature, mark_needs_coercion, preview_rows, sniff_header
+
+# Rows read to score column contents
+SAMPLE_ROWS = 2_000
+
+# Number of header signature -> mapping entries remembered
+MAX_REMEMBERED_SCHEMAS = 256
+
+REQUIRED_COLUMNS = ("Gene", "log2FoldChange", "padj")
+
+# Name scores per standard column: exact (cleaned) names, then substrings, then names that rule it out
+NAME_RULES = {
+    "Gene": ({"gene", "genename", "genesymbol", "symbol", "hgncsymbol", "genes"},
+             ("gene", "symbol"),
+             ("biotype", "type", "description", "chr", "start", "end", "length", "count")),
+    "log2FoldChange": ({"log2foldchange", "log2fc", "logfc", "lfc", "log2ratio", "log2fold"},
+                       ("log2", "logfc", "foldchange", "lfc"),
+                       ("se", "stderr", "pval", "padj", "stat")),
+    "padj": ({"padj", "padjusted", "adjpvalue", "adjpval", "pvaladj", "pvalueadj", "fdr", "qvalue", "qval", "adjp"},
+             ("padj", "fdr", "adjp", "qval"),
+             ()),
+    "regulation": ({"regulation", "direction", "updown"},
+                   ("regulation", "direction"),
+                   ()),
+    "contrast": ({"contrast", "comparison"},
+                 ("contrast", "comparison"),
+                 ()),
+}
+
+# Score of a plain p-value column as a last-resort padj
+RAW_PVALUE_SCORE = 0.5
+
+# A candidate needs at least this combined score
+MIN_SCORE = 1.0
+
+_detected = OrderedDict()
+_detected_lock = threading.Lock()
+
+
+def _clean(name):
+    return str(name).strip().lower().replace(" ", "").replace("_", "").replace(".", "").replace("-", "")
+
+
+def name_score(standard, col):
+    """How strongly the header `col` suggests the standard column `standard` (0 = not at all)."""
+    clean = _clean(col)
+    exact, partial, exclude = NAME_RULES[standard]
+    if clean in exact:
+        return 3.0
+    if standard == "log2FoldChange" and clean.startswith("lfc") and clean != "lfc":
+        return 0.0  # lfcSE, lfcMLE...
+    if any(word in clean for word in exclude):
+        return 0.0
+    if any(word in clean for word in partial):
+        return 1.5
+    if standard == "padj" and "pval" in clean:
+        return RAW_PVALUE_SCORE
+    return 0.0
+
+
+def _numeric(values):
+    # Numeric view of a sample column and the fraction of non-null values that parsed
+    numbers = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    present = int(values.notna().sum())
+    parsed = int(np.count_nonzero(~np.isnan(numbers)))
+    return numbers[~np.isnan(numbers)], (parsed / present if present else 0.0)
+
+
+def content_score(standard, values):
+    """
+    Score of a sample of column values as the standard column `standard`, or None if the
+    values rule it out (e.g. padj outside [0, 1] or a numeric gene column).
+    """
+    values = values.dropna()
+    if values.empty:
+        return 0.0
+    numbers, numeric_fraction = _numeric(values)
+    if standard == "padj":
+        if numeric_fraction < 0.9 or numbers.size == 0 or numbers.min() < 0 or numbers.max() > 1:
+            return None
+        return 2.0
+    if standard == "log2FoldChange":
+        if numeric_fraction < 0.9 or numbers.size == 0:
+            return None
+        positive, negative = np.count_nonzero(numbers > 0), np.count_nonzero(numbers < 0)
+        if min(positive, negative) == 0:
+            return None  # fold changes go both ways; SEs, means and counts do not
+        balance = min(positive, negative) / max(positive, negative)
+        spread = np.subtract(*np.percentile(numbers, [75, 25])) or np.std(numbers) or 1.0
+        symmetry = max(0.0, 1.0 - abs(np.median(numbers)) / spread)
+        return balance + symmetry
+    if numeric_fraction > 0.5:
+        return None  # gene names, regulation labels and contrasts are text
+    distinct = values.astype(str).nunique()
+    if standard == "Gene":
+        return 2.0 * distinct / len(values)
+    # regulation / contrast: a handful of labels
+    return 1.0 if distinct <= 20 else None
+
+
+def score_columns(sample):
+    """[(score, column position, standard name, raw column)] for every plausible candidate."""
+    candidates = []
+    for position, col in enumerate(sample.columns):
+        for standard in NAME_RULES:
+            named = name_score(standard, col)
+            if named == 0:
+                continue
+            content = content_score(standard, sample[col])
+            if content is None or named + content < MIN_SCORE:
+                continue
+            candidates.append((named + content, position, standard, col))
+    return candidates
+
+
+def detect_schema(sample):
+    """
+    {raw column: standard name} for a sample of a results table (a DataFrame of its first rows).
+
+    Candidates are assigned greedily from the highest score, each column and standard
+    name at most once; ties go to the leftmost column. A required column whose values
+    ruled out every candidate (e.g. a padj column full of "-" tokens) falls back to the
+    best name match, as read_de_table coerces such values to NaN.
+    """
+    column_map = {}
+    for _, _, standard, col in sorted(score_columns(sample), key=lambda c: (-c[0], c[1])):
+        if col not in column_map and standard not in column_map.values():
+            column_map[col] = standard
+    for standard in REQUIRED_COLUMNS:
+        if standard in column_map.values():
+            continue
+        named = [(name_score(standard, col), -position, col) for position, col in enumerate(sample.columns)
+                 if col not in column_map]
+        best = max(named, default=None)
+        if best is not None and best[0] > RAW_PVALUE_SCORE:
+            column_map[best[2]] = standard
+    # Keep file column order
+    return {col: column_map[col] for col in sample.columns if col in column_map}
+
+
+def detect_header(header):
+    """
+    {raw column: standard name} from the column names alone, by the same name scores.
+
+    For headers whose values are not available (yet). Candidates are assigned greedily
+    from the highest name score, ties to the leftmost column; a name that only suggests
+    a raw p-value is not taken as padj without values to back it.
+    """
+    candidates = [(name_score(standard, col), position, standard, col)
+                  for position, col in enumerate(header) for standard in NAME_RULES]
+    column_map = {}
+    for score, _, standard, col in sorted(candidates, key=lambda c: (-c[0], c[1])):
+        if score < MIN_SCORE:
+            break
+        if col not in column_map and standard not in column_map.values():
+            column_map[col] = standard
+    return {col: column_map[col] for col in header if col in column_map}
+
+
+def detect_columns(file, n_rows=SAMPLE_ROWS):
+    """
+    Detected {raw column: standard name} mapping of a results file (path or file object).
+
+    Reads only the header when a file with the same header was seen before; otherwise
+    samples the first `n_rows` rows, detects the mapping and remembers it. Stats columns
+    that hold non-numeric tokens in the sample are flagged so read_de_table parses them
+    with coercion straight away instead of failing and re-reading the file.
+    """
+    header = sniff_header(file)
+    signature = header_signature(header)
+    with _detected_lock:
+        column_map = _detected.get(signature)
+        if column_map is not None:
+            _detected.move_to_end(signature)
+            return dict(column_map)
+
+    sample = preview_rows(file, n=n_rows)
+    column_map = detect_schema(sample)
+    stats = [col for col, name in column_map.items() if name in ("log2FoldChange", "padj")]
+    if any(not pd.api.types.is_numeric_dtype(sample[col].dtype) for col in stats):
+        mark_needs_coercion(column_map)
+    with _detected_lock:
+        _detected[signature] = column_map
+        if len(_detected) > MAX_REMEMBERED_SCHEMAS:
+            _detected.popitem(last=False)
+    return dict(column_map)
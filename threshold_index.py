@@ -0,0 +1,110 @@
+"""Sorted index for answering log2FC/padj threshold queries without re-scanning the table."""
+
+import numpy as np
+
+
+class ThresholdIndex:
+    """
+    Sort orders of a result table by padj and by |log2FoldChange|, built once per dataset.
+
+    A threshold query is two binary searches: genes with padj < t are a prefix of the padj
+    order and genes with |log2FC| >= l a suffix of the |log2FC| order. The shorter range is
+    filtered on the other condition, so a slider move costs O(min(range)) rather than a full
+    mask over every row, and the result comes back already sorted by padj.
+    Row positions refer to the frame the index was built from.
+    """
+
+    def __init__(self, padj, log2fc):
+        padj = np.asarray(padj, dtype=np.float64)
+        abs_lfc = np.abs(np.asarray(log2fc, dtype=np.float32))
+        self.n_rows = padj.size
+        pos_dtype = np.int32 if self.n_rows < 2 ** 31 else np.int64
+
+        # NaN sorts last, so it never falls inside a "padj < t" prefix
+        self.padj_order = np.argsort(padj, kind="stable").astype(pos_dtype)
+        self.sorted_padj = padj[self.padj_order]
+        self.padj_rank = np.empty(self.n_rows, dtype=pos_dtype)
+        self.padj_rank[self.padj_order] = np.arange(self.n_rows, dtype=pos_dtype)
+        self.abs_lfc_by_padj = abs_lfc[self.padj_order]
+
+        # NaN |log2FC| sorts last too; it is excluded from the ">= l" suffix below
+        self.lfc_order = np.argsort(abs_lfc, kind="stable").astype(pos_dtype)
+        self.sorted_abs_lfc = abs_lfc[self.lfc_order]
+        self.n_lfc_valid = int(np.count_nonzero(~np.isnan(abs_lfc)))
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df["padj"].to_numpy(dtype=np.float64, na_value=np.nan),
+                   df["log2FoldChange"].to_numpy(dtype=np.float32, na_value=np.nan))
+
+    def append(self, padj, log2fc):
+        """
+        Index of the table with rows (padj, log2fc) appended, without re-sorting the old rows.
+
+        Only the new rows are sorted; they are then merged into the existing orders with a
+        binary search, so the cost is O(new log new + total) instead of O(total log total).
+        New rows take positions n_rows, n_rows + 1, ...; ties keep the older row first, as
+        a stable sort of the whole table would. The index itself is left unchanged.
+        """
+        padj = np.asarray(padj, dtype=np.float64)
+        abs_lfc = np.abs(np.asarray(log2fc, dtype=np.float32))
+        n_rows = self.n_rows + padj.size
+        pos_dtype = np.int32 if n_rows < 2 ** 31 else np.int64
+        new_positions = np.arange(self.n_rows, n_rows, dtype=pos_dtype)
+
+        merged = ThresholdIndex.__new__(ThresholdIndex)
+        merged.n_rows = n_rows
+
+        new_order = np.argsort(padj, kind="stable")
+        at = np.searchsorted(self.sorted_padj, padj[new_order], side="right")
+        merged.padj_order = np.insert(self.padj_order.astype(pos_dtype), at, new_positions[new_order])
+        merged.sorted_padj = np.insert(self.sorted_padj, at, padj[new_order])
+        merged.abs_lfc_by_padj = np.insert(self.abs_lfc_by_padj, at, abs_lfc[new_order])
+        merged.padj_rank = np.empty(n_rows, dtype=pos_dtype)
+        merged.padj_rank[merged.padj_order] = np.arange(n_rows, dtype=pos_dtype)
+
+        new_order = np.argsort(abs_lfc, kind="stable")
+        at = np.searchsorted(self.sorted_abs_lfc, abs_lfc[new_order], side="right")
+        merged.lfc_order = np.insert(self.lfc_order.astype(pos_dtype), at, new_positions[new_order])
+        merged.sorted_abs_lfc = np.insert(self.sorted_abs_lfc, at, abs_lfc[new_order])
+        merged.n_lfc_valid = self.n_lfc_valid + int(np.count_nonzero(~np.isnan(abs_lfc)))
+        return merged
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.padj_order, self.sorted_padj, self.padj_rank,
+                                      self.abs_lfc_by_padj, self.lfc_order, self.sorted_abs_lfc))
+
+    def significant_positions(self, padj_threshold, logfc_threshold):
+        """
+        Row positions with padj < padj_threshold and |log2FC| >= logfc_threshold, by ascending padj.
+
+        |log2FC| is stored as float32, so the threshold is compared as float32 on both
+        paths (as in de_pipeline.significance_mask); a value equal to the threshold counts:
+
+        >>> index = ThresholdIndex([0.01, 0.01, 0.5], [2.3, -2.3, 2.3])
+        >>> index.significant_positions(0.05, 2.3).tolist()  # |log2FC| prefix path
+        [0, 1]
+        >>> ThresholdIndex([0.01] * 3, [2.3, 0.1, 0.2]).significant_positions(0.05, 2.3).tolist()  # suffix path
+        [0]
+        """
+        logfc_threshold = np.float32(logfc_threshold)
+        n_padj = int(np.searchsorted(self.sorted_padj, padj_threshold, side="left"))
+        lfc_start = int(np.searchsorted(self.sorted_abs_lfc[:self.n_lfc_valid], logfc_threshold, side="left"))
+        n_lfc = self.n_lfc_valid - lfc_start
+
+        if n_padj <= n_lfc:
+            # Walk the padj prefix; it is already in padj order
+            return self.padj_order[:n_padj][self.abs_lfc_by_padj[:n_padj] >= logfc_threshold]
+
+        # Walk the |log2FC| suffix and flag its padj hits by rank, which restores padj order
+        ranks = self.padj_rank[self.lfc_order[lfc_start:self.n_lfc_valid]]
+        in_prefix = np.zeros(n_padj, dtype=bool)
+        in_prefix[ranks[ranks < n_padj]] = True
+        return self.padj_order[:n_padj][in_prefix]
+
+    def mask(self, positions):
+        """Boolean row mask (e.g. the Significant column) for positions from significant_positions."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[positions] = True
+        return mask
@@ -0,0 +1,57 @@
+"""Vectorized transforms shared by the volcano dashboards."""
+
+import numpy as np
+import pandas as pd
+
+# How padj == 0 is handled by default: clipped to the smallest positive padj in the data
+DEFAULT_PADJ_FLOOR = "min_positive"
+
+
+def padj_floor(values, floor=DEFAULT_PADJ_FLOOR):
+    """
+    Resolves the value substituted for padj == 0 before taking -log10.
+
+    `floor` may be "min_positive" (smallest positive padj in `values`, falling back to the
+    smallest normal float64 if there is none), "tiny" (smallest normal float64),
+    "eps" (float64 machine epsilon) or a positive number.
+    """
+    if floor == "min_positive":
+        positive = values[values > 0]
+        return positive.min() if positive.size else np.finfo(np.float64).tiny
+    elif floor == "tiny":
+        return np.finfo(np.float64).tiny
+    elif floor == "eps":
+        return np.finfo(np.float64).eps
+    elif isinstance(floor, (int, float)) and floor > 0:
+        return float(floor)
+    raise ValueError(f"Unknown padj floor: {floor!r}")
+
+
+def neg_log10_padj(padj, floor=DEFAULT_PADJ_FLOOR):
+    """
+    Computes -log10(padj) in one vectorized pass.
+
+    Zeros are clipped to `floor` (see `padj_floor`; None leaves them NaN), while NaN and
+    negative values give NaN. Accepts a Series (NumPy- or Arrow-backed) or an array and
+    returns the same kind; Arrow-backed input gives an Arrow-backed double column.
+    """
+    if isinstance(padj, pd.Series):
+        values = padj.to_numpy(dtype=np.float64, na_value=np.nan)
+    else:
+        values = np.asarray(padj, dtype=np.float64)
+
+    result = np.full(values.shape, np.nan)
+    positive = values > 0
+    np.log10(values, out=result, where=positive)
+    np.negative(result, out=result, where=positive)
+    if floor is not None:
+        zero = values == 0
+        if zero.any():
+            result[zero] = -np.log10(padj_floor(values, floor))
+
+    if not isinstance(padj, pd.Series):
+        return result
+    if isinstance(padj.dtype, pd.ArrowDtype):
+        # NaN becomes a proper null in the Arrow array
+        return pd.Series(pd.array(result, dtype="double[pyarrow]"), index=padj.index, name=padj.name)
+    return pd.Series(result, index=padj.index, name=padj.name)
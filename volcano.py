@@ -0,0 +1,197 @@
+"""Volcano plot construction with a bounded payload for large result tables."""
+
+import altair as alt
+import numpy as np
+import pandas as pd
+
+from perf import stage
+
+# Above this many genes the non-significant core is no longer sent as individual points
+DEFAULT_MAX_POINTS = 5000
+# Significant genes beyond this (lowest padj first) join the background layer
+DEFAULT_MAX_SIGNIFICANT = 20000
+# Grid (log2FC x -log10 padj) used for the density layer and the stratified subsample
+DEFAULT_BINS = (80, 50)
+
+RENDER_MODES = {
+    "Auto": "auto",
+    "All points": "points",
+    "Density (binned)": "density",
+    "Stratified subsample": "subsample",
+}
+
+
+def parse_gene_list(text):
+    """Splits a comma/whitespace separated gene list typed by the user."""
+    return [gene for gene in text.replace(",", " ").split() if gene]
+
+
+def _xy(df):
+    x = df["log2FoldChange"].to_numpy(dtype=np.float64, na_value=np.nan)
+    y = df["-log10(padj)"].to_numpy(dtype=np.float64, na_value=np.nan)
+    return x, y
+
+
+def _grid_cells(x, y, bins):
+    # Flat (x bin, y bin) cell index for every point, plus the bin edges
+    x_edges = np.linspace(x.min(), x.max(), bins[0] + 1)
+    y_edges = np.linspace(y.min(), y.max(), bins[1] + 1)
+    xi = np.clip(np.searchsorted(x_edges, x, side="right") - 1, 0, bins[0] - 1)
+    yi = np.clip(np.searchsorted(y_edges, y, side="right") - 1, 0, bins[1] - 1)
+    return xi * bins[1] + yi, x_edges, y_edges
+
+
+def density_bins(x, y, bins=DEFAULT_BINS):
+    """2D histogram of the points as a frame of non-empty rectangles (x, x2, y, y2, count)."""
+    if x.size == 0:
+        return pd.DataFrame(columns=["x", "x2", "y", "y2", "count"])
+    cells, x_edges, y_edges = _grid_cells(x, y, bins)
+    counts = np.bincount(cells, minlength=bins[0] * bins[1])
+    occupied = np.flatnonzero(counts)
+    xi, yi = np.divmod(occupied, bins[1])
+    return pd.DataFrame({
+        "x": x_edges[xi], "x2": x_edges[xi + 1],
+        "y": y_edges[yi], "y2": y_edges[yi + 1],
+        "count": counts[occupied],
+    })
+
+
+def stratified_subsample(x, y, n, bins=DEFAULT_BINS, seed=0):
+    """
+    Picks at most `n` point indices, taking the same maximum number from every grid cell.
+
+    Sparse cells (the tails of the volcano) are kept whole while the dense core is thinned.
+    """
+    if x.size <= n:
+        return np.arange(x.size)
+    cells, _, _ = _grid_cells(x, y, bins)
+    counts = np.bincount(cells)
+    counts = counts[counts > 0]
+
+    # Largest per-cell cap whose total stays within n
+    lo, hi = 0, int(counts.max())
+    while lo < hi:
+        cap = (lo + hi + 1) // 2
+        if np.minimum(counts, cap).sum() <= n:
+            lo = cap
+        else:
+            hi = cap - 1
+    cap = max(lo, 1)
+
+    # Random order within each cell, then keep each cell's first `cap` points
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(x.size), cells))
+    sorted_cells = cells[order]
+    rank = np.arange(x.size) - np.searchsorted(sorted_cells, sorted_cells, side="left")
+    keep = order[rank < cap]
+    if keep.size > n:
+        keep = rng.choice(keep, size=n, replace=False)
+    return np.sort(keep)
+
+
+def _point_layer(data, width, height):
+    return alt.Chart(data).mark_circle(size=60).encode(
+        x=alt.X("log2FoldChange", title="log2 Fold Change"),
+        y=alt.Y("-log10(padj)", title="-log10 Adjusted P-value"),
+        color=alt.condition(
+            "datum.Significant == true",
+            alt.value("red"),
+            alt.value("gray")
+        ),
+        tooltip=["Gene", "log2FoldChange", "padj"]
+    ).properties(width=width, height=height)
+
+
+def _highlight_layers(highlight_df):
+    # User-highlighted genes: larger orange points with their names
+    if highlight_df.empty:
+        return []
+    base = alt.Chart(highlight_df).encode(x="log2FoldChange", y="-log10(padj)")
+    return [
+        base.mark_circle(size=120, color="orange", stroke="black").encode(
+            tooltip=["Gene", "log2FoldChange", "padj"]),
+        base.mark_text(dy=-12, fontWeight="bold").encode(text="Gene"),
+    ]
+
+
+def volcano_chart(df, highlight=(), mode="auto", max_points=DEFAULT_MAX_POINTS,
+                  max_significant=DEFAULT_MAX_SIGNIFICANT, bins=DEFAULT_BINS,
+                  width=800, height=500, rows=None):
+    """
+    Builds the volcano plot for a frame with Gene, log2FoldChange, padj, -log10(padj)
+    and Significant columns.
+
+    mode "points" sends every gene (the original chart). "density" and "subsample" always
+    send significant and `highlight` genes as points and the remaining genes as a binned
+    density layer or a stratified subsample of at most `max_points`; "auto" picks "points"
+    for tables up to `max_points` genes and "density" above that. The payload is therefore
+    bounded by max_significant + len(highlight) + max(max_points, bins) rows.
+
+    `rows` (sorted row positions, e.g. a regulation filter) restricts the plot to those
+    rows; only the rows sent as points are ever taken out of `df`.
+    """
+    with stage("volcano_chart", rows=len(df) if rows is None else len(rows)):
+        return _volcano_chart(df, rows, highlight, mode, max_points, max_significant, bins, width, height)
+
+
+def _volcano_chart(df, rows, highlight, mode, max_points, max_significant, bins, width, height):
+    x, y = _xy(df)
+    # One combined mask (filter & finite coordinates) -> the positions plotted
+    keep = np.isfinite(x) & np.isfinite(y)
+    if rows is not None:
+        in_rows = np.zeros(len(df), dtype=bool)
+        in_rows[rows] = True
+        keep &= in_rows
+    positions = None if keep.all() else np.flatnonzero(keep)
+    if positions is not None:
+        x, y = x[positions], y[positions]
+
+    def take(mask=None):
+        # Frame of the plotted rows selected by `mask` (over the plotted positions)
+        if mask is None:
+            return df if positions is None else df.iloc[positions]
+        selected = np.flatnonzero(mask)
+        return df.iloc[selected if positions is None else positions[selected]]
+
+    def column(name, **kwargs):
+        values = df[name].to_numpy(**kwargs)
+        return values if positions is None else values[positions]
+
+    if mode == "auto":
+        mode = "points" if x.size <= max_points else "density"
+    highlighted = df["Gene"].isin(list(highlight)).to_numpy(dtype=bool, na_value=False)
+    if positions is not None:
+        highlighted = highlighted[positions]
+    if mode == "points":
+        layers = [_point_layer(take(), width, height)]
+        return alt.layer(*layers, *_highlight_layers(take(highlighted))).interactive()
+
+    # Split into foreground points (significant + highlighted) and the background core
+    significant = column("Significant", dtype=bool, na_value=False, copy=True)  # trimmed below
+    if significant.sum() > max_significant:
+        padj = column("padj", dtype=np.float64, na_value=np.nan)
+        sig_idx = np.flatnonzero(significant)
+        overflow = sig_idx[np.argsort(padj[sig_idx], kind="stable")[max_significant:]]
+        significant[overflow] = False
+    foreground = significant | highlighted
+
+    background = ~foreground
+    if mode == "subsample":
+        bg_idx = np.flatnonzero(background)
+        keep = np.zeros(x.size, dtype=bool)
+        keep[bg_idx[stratified_subsample(x[bg_idx], y[bg_idx], max_points, bins)]] = True
+        layers = [_point_layer(take(keep), width, height).encode(opacity=alt.value(0.5))]
+    else:
+        bins_df = density_bins(x[background], y[background], bins)
+        layers = [alt.Chart(bins_df).mark_rect().encode(
+            x=alt.X("x:Q", title="log2 Fold Change"),
+            x2="x2:Q",
+            y=alt.Y("y:Q", title="-log10 Adjusted P-value"),
+            y2="y2:Q",
+            color=alt.Color("count:Q", scale=alt.Scale(type="log", range=["#e6e6e6", "#4d4d4d"]),
+                            legend=alt.Legend(title="Genes per bin")),
+            tooltip=[alt.Tooltip("count:Q", title="Genes")]
+        ).properties(width=width, height=height)]
+
+    layers.append(_point_layer(take(significant & ~highlighted), width, height))
+    return alt.layer(*layers, *_highlight_layers(take(highlighted))).interactive()